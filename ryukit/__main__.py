@@ -1,3 +1,4 @@
 import ryukit
 
-ryukit.start()
+if __name__ == "__main__":
+    ryukit.start()
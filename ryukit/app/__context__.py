@@ -1,36 +1,180 @@
 import contextlib
+import copy
 import importlib
-import importlib.metadata
-import importlib.resources
 import json
 import pathlib
+import traceback
 from typing import Annotated, Any, Literal, TypedDict, cast
 
-import jsonschema
+import click
 import rich
 import rich.theme
 import typer
+import typer.core
+import typer.main
+import typer.models
 
 from .. import utils
-from ..libs import db, paths
+from ..libs import configs, paths
 
 __all__ = [
     "USER_CONFIGS",
+    "LOADED_CONFIGS",
     "INTERNAL_CONFIGS",
     "command",
     "app",
+    "save_app",
     "console",
     "bucket",
+    "lazy_group",
+    "invoke",
 ]
-app = typer.Typer(rich_markup_mode="rich")
-USER_CONFIGS: dict[str, Any] = (
-    json.loads(pathlib.Path(paths.CONFIG_FILE).read_bytes())
-    if pathlib.Path(paths.CONFIG_FILE).exists()
-    else {
-        "$schema": "https://github.com/A-2-4-8-5-10-9-7-3-6-1/ryukit/tree/main/ryukit/ryukitconfigs.schema.json",
-        "ryujinxInstallURL": None,
-    }
+
+
+def lazy_group(
+    commands: dict[str, tuple[str, str]], /
+) -> type[typer.core.TyperGroup]:
+    """
+    Make a command-group class that imports a command's module only once the command is dispatched.
+
+    Until then, the command is listed with its registered help text, so listing commands imports none of them.
+
+    :param commands: Modules defining commands, and the commands' one-line help texts, keyed by command name. Every module's command function shares its command's name.
+    """
+
+    class LazyGroup(typer.core.TyperGroup):
+        def list_commands(self, ctx: click.Context):
+            return [
+                *commands,
+                *(
+                    name
+                    for name in super().list_commands(ctx)
+                    if name not in commands
+                ),
+            ]
+
+        def get_command(self, ctx: click.Context, cmd_name: str):
+            if cmd_name in self.commands or cmd_name not in commands:
+                return super().get_command(ctx, cmd_name)
+            return click.Command(cmd_name, help=commands[cmd_name][1])
+
+        def resolve_command(self, ctx: click.Context, args: list[str]):
+            if args and args[0] in commands and args[0] not in self.commands:
+                module, _ = commands[args[0]]
+                self.add_command(
+                    typer.main.get_command_from_info(
+                        typer.models.CommandInfo(
+                            name=args[0],
+                            callback=getattr(
+                                importlib.import_module(module), args[0]
+                            ),
+                        ),
+                        pretty_exceptions_short=True,
+                        rich_markup_mode=self.rich_markup_mode,
+                    )
+                )
+            return super().resolve_command(ctx, args)
+
+    return LazyGroup
+
+
+app = typer.Typer(
+    rich_markup_mode="rich",
+    cls=lazy_group(
+        {
+            "batch": ("ryukit.app.batch", "Run many commands in one process."),
+            "daemon": (
+                "ryukit.app.daemon",
+                "Serve save commands from a warm process, over a local socket.",
+            ),
+            "install_ryujinx": (
+                "ryukit.app.install_ryujinx",
+                "Install Ryujinx.",
+            ),
+            "track": (
+                "ryukit.app.track",
+                "Monitor a Ryujinx play session and save changes into a bucket.",
+            ),
+        }
+    ),
+)
+save_app = typer.Typer(
+    name="save",
+    help="Manage save buckets.",
+    no_args_is_help=True,
+    cls=lazy_group(
+        {
+            "apply": (
+                "ryukit.app.save.apply",
+                "Apply data from a save bucket into Ryujinx.",
+            ),
+            "create": ("ryukit.app.save.create", "Create a save bucket."),
+            "drop": ("ryukit.app.save.drop", "Delete save buckets."),
+            "dump": (
+                "ryukit.app.save.dump",
+                "Dump your save buckets into a recovery file.",
+            ),
+            "ls": ("ryukit.app.save.ls", "List your save buckets."),
+            "pull": (
+                "ryukit.app.save.pull",
+                "Pull data from Ryujinx into a save bucket.",
+            ),
+            "relabel": (
+                "ryukit.app.save.relabel",
+                "Relabel an existing bucket.",
+            ),
+            "restore": (
+                "ryukit.app.save.restore",
+                "Restore saves from a dump file, or a chain of them.",
+            ),
+            "stage": (
+                "ryukit.app.save.stage",
+                "Prepare a save bucket for a near-instant apply.",
+            ),
+        }
+    ),
 )
+app.add_typer(save_app)
+
+
+def invoke(argv: list[str], /):
+    """
+    Run a command line through the app, within this process.
+
+    Errors are reported as they would be from a terminal, with unexpected ones printed as tracebacks.
+
+    :param argv: The command line, after 'ryukit'.
+    :returns: The exit code.
+    """
+
+    try:
+        app(argv, prog_name="ryukit")
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+USER_CONFIGS: dict[str, Any] = {
+    "$schema": "https://github.com/A-2-4-8-5-10-9-7-3-6-1/ryukit/tree/main/ryukit/ryukitconfigs.schema.json",
+    "ryujinxInstallURL": None,
+    "downloadCacheSize": 2048,
+    "downloadConnections": 4,
+    "saveStorage": "plain",
+    "saveTransfer": "reflink",
+    "saveTransferWorkers": 8,
+    "saveApply": "sync",
+    "trackCheckpointInterval": 300,
+    "trackCheckpointChange": 64,
+    **(
+        json.loads(pathlib.Path(paths.CONFIG_FILE).read_bytes())
+        if pathlib.Path(paths.CONFIG_FILE).exists()
+        else {}
+    ),
+}
+LOADED_CONFIGS = copy.deepcopy(USER_CONFIGS)
 command = app.command
 console = rich.console.Console(
     theme=rich.theme.Theme({"error": "red"}), highlight=False
@@ -47,8 +191,14 @@ def INTERNAL_CONFIGS():
         },
     )
     SaveBuckets = TypedDict("", {"flow": dict[str, str]})
+    Track = TypedDict("", {"checkpoint_quiet": float})
     InternalConfigs = TypedDict(
-        "", {"ryujinx_install": RyujinxInstall, "save_buckets": SaveBuckets}
+        "",
+        {
+            "ryujinx_install": RyujinxInstall,
+            "save_buckets": SaveBuckets,
+            "track": Track,
+        },
     )
     return cast(
         InternalConfigs,
@@ -68,6 +218,7 @@ def INTERNAL_CONFIGS():
                     paths.SAVE_INSTANCE_SYSTEM_DATA: f"{paths.RYUJINX_DATA_DIR}/bis/system/save",
                 }
             },
+            "track": {"checkpoint_quiet": 2},
         },
     )
 
@@ -81,6 +232,8 @@ def bucket(id_: int, /):
     :raises typer.Exit: If the bucket doesn't exist.
     """
 
+    from ..libs import db
+
     with db.client() as client:
         save = client.get(db.RyujinxSave, {"id": id_})
         if not save:
@@ -97,21 +250,21 @@ def _(
 ):
     "A CLI tool for Ryujinx."
 
+    import importlib.metadata
+    import importlib.resources
+
     try:
-        cast(
-            Any,
-            jsonschema.Draft7Validator(
-                json.loads(
-                    importlib.resources.read_text(
-                        "ryukit", "ryukitconfigs.schema.json"
-                    )
-                )
+        configs.validate(
+            USER_CONFIGS,
+            importlib.resources.read_text(
+                "ryukit", "ryukitconfigs.schema.json"
             ),
-        ).validate(USER_CONFIGS)
-    except jsonschema.ValidationError as e:
+        )
+    except ValueError as e:
+        message, json_path = e.args
         console.print(
-            f"[error]Malformed configuration file. {e.message}.",
-            f"└── Error originated from {e.json_path}.",
+            f"[error]Malformed configuration file. {message}.",
+            f"└── Error originated from {json_path}.",
             sep="\n",
         )
         raise typer.Exit(1)
@@ -1,42 +1,31 @@
 """App implementation."""
 
-import pathlib
-import runpy
+import os
+import shutil
+import sys
 
-from .. import utils
-from ..libs import paths
-from .__context__ import USER_CONFIGS, app
+from ..libs import configs, ipc, paths
 
 __all__ = ["start"]
-any(
-    map(
-        lambda _: False,
-        map(
-            runpy.run_module,
-            [
-                "ryukit.app.install_ryujinx",
-                "ryukit.app.save.apply",
-                "ryukit.app.save.create",
-                "ryukit.app.save.drop",
-                "ryukit.app.save.dump",
-                "ryukit.app.save.ls",
-                "ryukit.app.save.pull",
-                "ryukit.app.save.relabel",
-                "ryukit.app.save.restore",
-                "ryukit.app.track",
-            ],
-        ),
-    )
-)
 
 
 def start():
+    if sys.argv[1:2] == ["save"]:
+        response = ipc.request(
+            paths.DAEMON_SOCKET,
+            {
+                "argv": sys.argv[1:],
+                "cwd": os.getcwd(),
+                "columns": shutil.get_terminal_size().columns,
+            },
+        )
+        if response is not None:
+            sys.stdout.write(response["output"])
+            sys.exit(response["code"])
+
+    from .__context__ import LOADED_CONFIGS, USER_CONFIGS, app
+
     try:
         app()
     finally:
-        pathlib.Path(paths.CONFIG_FILE).parent.mkdir(
-            parents=True, exist_ok=True
-        )
-        pathlib.Path(paths.CONFIG_FILE).write_text(
-            utils.json_dumps(USER_CONFIGS, indent=2)
-        )
+        configs.save(paths.CONFIG_FILE, LOADED_CONFIGS, USER_CONFIGS)
@@ -0,0 +1,96 @@
+import contextlib
+import json
+import shlex
+import time
+from typing import Annotated, cast
+
+import rich.table
+import typer
+
+from ..app.__context__ import command, console, invoke
+from ..libs import components, db
+
+__all__ = ["batch"]
+
+
+@command("batch")
+def batch(
+    script: Annotated[
+        typer.FileText,
+        typer.Argument(
+            help="File of commands, one per line, or '-' to read them from standard input."
+        ),
+    ],
+    transaction: Annotated[
+        bool,
+        typer.Option(
+            "--transaction",
+            help="Run every command in one database transaction.",
+        ),
+    ] = False,
+    keep_going: Annotated[
+        bool,
+        typer.Option("--keep-going", help="Carry on past failing commands."),
+    ] = False,
+):
+    """
+    Run many commands in one process.
+
+    Every line is a command line, without the leading 'ryukit', or a JSON array of its arguments. Blank lines, and '#' comments, are skipped. A failing command stops the batch, unless 'keep-going' is set. Every command's exit code and run time are reported once the batch ends.
+
+    With 'transaction', database changes are committed together, once the batch ends, and a batch stopped by a failing command leaves none behind. Files written by the commands are kept either way.
+    """
+
+    commands: list[tuple[int, list[str]]] = []
+    for number, line in enumerate(script, 1):
+        try:
+            parsed: object = (
+                json.loads(line)
+                if line.lstrip().startswith("[")
+                else shlex.split(line, comments=True)
+            )
+            if not isinstance(parsed, list) or not all(
+                isinstance(arg, str) for arg in cast(list[object], parsed)
+            ):
+                raise ValueError("Expected an array of strings")
+        except ValueError as e:
+            console.print(
+                f"[error]Malformed line '{number}'. {e}.",
+                "└── Write commands as you would in a shell, or as JSON arrays.",
+                sep="\n",
+            )
+            raise typer.Exit(1)
+        args = cast(list[str], parsed)
+        if args[:1] == ["ryukit"]:
+            args = args[1:]
+        if args:
+            commands.append((number, args))
+    timings = components.Table(
+        rich.table.Column("LINE", justify="center"),
+        rich.table.Column("COMMAND"),
+        rich.table.Column("EXIT", justify="center"),
+        rich.table.Column("TIME", justify="center"),
+    )
+    failed = False
+    try:
+        with db.transaction() if transaction else contextlib.nullcontext():
+            for number, args in commands:
+                start = time.perf_counter()
+                code = invoke(args)
+                timings.add_row(
+                    str(number),
+                    shlex.join(args),
+                    str(code),
+                    f"{(time.perf_counter() - start) * 1000:.1f}ms",
+                )
+                failed = failed or code != 0
+                if code and (not keep_going or code == 130):
+                    raise typer.Exit(code)
+    except typer.Exit:
+        console.print(timings)
+        if transaction:
+            console.print("Rolled back the batch's database changes.")
+        raise
+    console.print(timings)
+    if failed:
+        raise typer.Exit(1)
@@ -0,0 +1,106 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import pathlib
+from typing import Annotated, Any
+
+import typer
+
+from ..app.__context__ import (
+    LOADED_CONFIGS,
+    USER_CONFIGS,
+    command,
+    console,
+    invoke,
+)
+from ..libs import ipc, paths
+
+__all__ = ["daemon"]
+
+
+@command("daemon")
+def daemon(
+    stop: Annotated[
+        bool, typer.Option("--stop", help="Stop the running daemon.")
+    ] = False,
+):
+    """
+    Serve save commands from a warm process, over a local socket.
+
+    While the daemon runs, 'ryukit save' calls are forwarded to it, and skip the imports, database setup and configuration checks a fresh process pays for. Commands are served one at a time, and see configuration changes as they're made.
+
+    Needs Unix domain sockets.
+    """
+
+    def handle(request: dict[str, Any]) -> dict[str, Any]:
+        if "argv" not in request:
+            return {"stop": bool(request.get("stop"))}
+        if os.path.isfile(paths.CONFIG_FILE):
+            try:
+                loaded = json.loads(
+                    pathlib.Path(paths.CONFIG_FILE).read_bytes()
+                )
+            except ValueError as e:
+                return {
+                    "output": f"Malformed configuration file '{paths.CONFIG_FILE}'. {e}.\n",
+                    "code": 1,
+                }
+            USER_CONFIGS.update(loaded)
+            LOADED_CONFIGS.update(copy.deepcopy(loaded))
+        output = io.StringIO()
+        cwd, columns = os.getcwd(), os.environ.get("COLUMNS")
+        try:
+            os.chdir(request["cwd"])
+        except OSError as e:
+            return {
+                "output": f"Couldn't enter '{request["cwd"]}'. {e.strerror}.\n",
+                "code": 1,
+            }
+        try:
+            os.environ["COLUMNS"] = str(request["columns"])
+            with (
+                contextlib.redirect_stdout(output),
+                contextlib.redirect_stderr(output),
+            ):
+                code = invoke(request["argv"])
+        finally:
+            os.chdir(cwd)
+            if columns is None:
+                os.environ.pop("COLUMNS", None)
+            else:
+                os.environ["COLUMNS"] = columns
+        return {"output": output.getvalue(), "code": code}
+
+    if stop:
+        if ipc.request(paths.DAEMON_SOCKET, {"stop": True}) is None:
+            console.print("[error]No daemon is running.")
+            raise typer.Exit(1)
+        console.print("Stopped the daemon.")
+        return
+    if not ipc.supported():
+        console.print(
+            "[error]Couldn't serve on this platform.",
+            "└── The daemon needs Unix domain sockets.",
+            sep="\n",
+        )
+        raise typer.Exit(1)
+    try:
+        ipc.serve(
+            paths.DAEMON_SOCKET,
+            handle,
+            ready=lambda: console.print(
+                f"Serving on '{paths.DAEMON_SOCKET}'."
+            ),
+        )
+    except FileExistsError:
+        console.print(
+            "[error]A daemon is already running.",
+            "└── Stop it with 'ryukit daemon --stop'.",
+            sep="\n",
+        )
+        raise typer.Exit(1)
+    except KeyboardInterrupt:
+        pass
+    console.print("Daemon stopped.")
@@ -1,57 +1,676 @@
+import concurrent.futures
+import datetime
+import glob
+import json
+import os
 import pathlib
+import re
 import shutil
-from collections.abc import Sequence
+import tarfile
+import time
+from collections.abc import Iterable
+from typing import IO, Any, Literal, TypedDict, cast
 
-import typer
+import sqlalchemy
+import sqlalchemy.orm
 
+from ... import utils
+from ...libs import db, paths, store, sync
 from ..__context__ import *
 
 __all__ = [
+    "Transfer",
+    "Compression",
+    "COMPRESSIONS",
+    "flows",
     "channel_save_bucket",
+    "pull_save_bucket",
+    "describe_transfer",
+    "stage_save_bucket",
+    "recover_staging",
+    "store_save_bucket",
+    "archive_save_bucket",
+    "pack_save_bucket",
+    "read_dump_index",
+    "unpack_save_bucket",
+    "save_bucket_size",
+    "record_save_bucket",
+    "collect_save_garbage",
     "USER_CONFIGS",
     "INTERNAL_CONFIGS",
     "command",
     "console",
     "bucket",
 ]
-save = typer.Typer(name="save", no_args_is_help=True)
-command = save.command
-app.add_typer(save)
+Transfer = TypedDict(
+    "Transfer", {"files": int, "bytes": int, "seconds": float}
+)
+Compression = Literal["gz", "xz", "bz2", "zstd"]
+COMPRESSIONS: list[Compression] = [
+    "gz",
+    "xz",
+    "bz2",
+    *cast(
+        list[Compression],
+        ["zstd"] if hasattr(tarfile.TarFile, "zstopen") else [],
+    ),
+]
+command = save_app.command
+
 
+def flows(bucket_id: int, /, *, staged: bool = False):
+    """
+    Get the directory pairs a save bucket channels through.
 
-@save.callback()
-def _():
-    """Manage save buckets."""
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param staged: Set as true to swap Ryujinx-side directories for their staging directories.
+    :returns: Triples of a pair's manifest key, bucket-side directory, and Ryujinx-side directory.
+    """
 
+    root = pathlib.Path(paths.SAVE_INSTANCE_DIR.format(id=bucket_id))
+    return [
+        (
+            pathlib.Path(x.format(id=bucket_id)).relative_to(root).as_posix(),
+            x.format(id=bucket_id),
+            f"{y}.ryukit-staged" if staged else y,
+        )
+        for x, y in INTERNAL_CONFIGS["save_buckets"]["flow"].items()
+    ]
 
-def channel_save_bucket(bucket_id: int, /, *, upstream: bool):
+
+def channel_save_bucket(
+    bucket_id: int,
+    /,
+    *,
+    upstream: bool,
+    staged: bool = False,
+    progress: sync.Advance | None = None,
+) -> Transfer:
     """
     Channel content between a save bucket and Ryujinx.
 
+    Only files that differ between both sides are transferred, with every directory pair channeled at once and file transfers fanned out to 'saveTransferWorkers' threads. Pulled content is kept according to the 'saveStorage' configuration. When 'saveApply' is 'staged', applied content is swapped in from staging directories, unless the bucket is scoped to titles, or another process is staging, in which case it's applied directly. Scoped buckets only channel their titles' subdirectories of each pair, and leave the rest be.
+
     :param upstream: Set as true to channel from the bucket to Ryujinx, and as false to do the reverse.
     :param bucket_id: ID belonging to the subject save bucket.
+    :param staged: Set as true to channel into staging directories, rather than Ryujinx's. Only applies upstream.
+    :param progress: Called as files are channeled. See 'sync.mirror'.
+    :returns: A tally of the transfer.
+    """
+
+    with bucket(bucket_id) as (_, save):
+        scope = save.scope
+    if upstream and not staged and USER_CONFIGS["saveApply"] == "staged":
+        with staging_lock(block=False) as held:
+            if held:
+                recover_staging()
+            if held and scope is None:
+                start = time.perf_counter()
+                transfer = Transfer(files=0, bytes=0, seconds=0)
+                if read_staging() != {
+                    "bucket": bucket_id,
+                    "stamp": staging_stamp(bucket_id),
+                }:
+                    transfer = fill_staging(bucket_id, progress=progress)
+                swap_staging()
+                return Transfer(
+                    files=transfer["files"],
+                    bytes=transfer["bytes"],
+                    seconds=time.perf_counter() - start,
+                )
+
+    def tally(reports: Iterable[sync.Report]):
+        reports = list(reports)
+        return sync.Report(
+            files=sum(report["files"] for report in reports),
+            bytes=sum(report["bytes"] for report in reports),
+        )
+
+    def materialize(flow: tuple[str, str, str]):
+        tree = cast(store.Manifest, manifest).get(flow[0])
+        if scope is None:
+            return store.materialize(
+                tree, flow[2], mode=mode, pool=pool, progress=progress
+            )
+        return tally(
+            store.materialize(
+                store.subtree(tree, title),
+                f"{flow[2]}/{title}",
+                mode=mode,
+                pool=pool,
+                progress=progress,
+            )
+            for title in scope
+        )
+
+    def mirror(flow: tuple[str, str, str]):
+        return tally(
+            sync.sync(
+                *((source, dest) if upstream else (dest, source)),
+                mode=mode,
+                pool=pool,
+                progress=progress,
+            )
+            for source, dest in (
+                [(flow[1], flow[2])]
+                if scope is None
+                else [
+                    (f"{flow[1]}/{title}", f"{flow[2]}/{title}")
+                    for title in scope
+                ]
+            )
+        )
+
+    def ingest(flow: tuple[str, str, str]):
+        if scope is None:
+            return store.ingest(
+                flow[2],
+                previous=previous.get(flow[0]),
+                mode=mode,
+                pool=pool,
+                progress=progress,
+            )
+        return store.graft(
+            {
+                title: store.ingest(
+                    f"{flow[2]}/{title}",
+                    previous=store.subtree(previous.get(flow[0]), title),
+                    mode=mode,
+                    pool=pool,
+                    progress=progress,
+                )
+                for title in scope
+                if os.path.isdir(f"{flow[2]}/{title}")
+            }
+        )
+
+    manifest_file = paths.SAVE_INSTANCE_MANIFEST.format(id=bucket_id)
+    manifest = store.read_manifest(manifest_file)
+    previous = manifest or {}
+    pairs = flows(bucket_id, staged=upstream and staged)
+    mode: sync.Mode = USER_CONFIGS["saveTransfer"]
+    start = time.perf_counter()
+    with (
+        concurrent.futures.ThreadPoolExecutor(
+            USER_CONFIGS["saveTransferWorkers"]
+        ) as pool,
+        concurrent.futures.ThreadPoolExecutor(len(pairs)) as walkers,
+    ):
+        if upstream and manifest is not None:
+            reports = list(walkers.map(materialize, pairs))
+        elif upstream or USER_CONFIGS["saveStorage"] == "plain":
+            reports = list(walkers.map(mirror, pairs))
+            if manifest is not None:
+                os.unlink(manifest_file)
+                collect_save_garbage()
+        else:
+            present = [flow for flow in pairs if os.path.isdir(flow[2])]
+            with store.lock():
+                update = dict(
+                    zip(
+                        (key for key, *_ in present),
+                        walkers.map(ingest, present),
+                    )
+                )
+                store.write_manifest(manifest_file, update)
+            for _, dest, _ in pairs:
+                shutil.rmtree(dest, ignore_errors=True)
+            if manifest is not None:
+                collect_save_garbage()
+            changes = [
+                entry
+                for key, tree in update.items()
+                for path, entry in tree["files"].items()
+                if key not in previous
+                or previous[key]["files"].get(path) != entry
+            ]
+            reports = [
+                sync.Report(
+                    files=len(changes),
+                    bytes=sum(entry["size"] for entry in changes),
+                )
+            ]
+    return Transfer(
+        files=sum(report["files"] for report in reports),
+        bytes=sum(report["bytes"] for report in reports),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def pull_save_bucket(
+    bucket_id: int, /, *, progress: sync.Advance | None = None
+):
+    """
+    Pull Ryujinx's save data into a save bucket, and record the bucket's new content.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param progress: Called as files are pulled. See 'sync.mirror'.
+    :returns: A tally of the transfer.
+    """
+
+    transfer = channel_save_bucket(
+        bucket_id, upstream=False, progress=progress
+    )
+    with bucket(bucket_id) as (client, save):
+        save.size = record_save_bucket(client, bucket_id)
+        save.updated = datetime.datetime.now(datetime.timezone.utc)
+    return transfer
+
+
+def describe_transfer(transfer: Transfer, /):
+    """
+    Summarize a transfer tally.
+
+    :param transfer: The tally.
+    """
+
+    return f"Transferred {transfer["files"]} file(s), {utils.megabytes(transfer["bytes"]):.1f}MB at {utils.megabytes(int(transfer["bytes"] / max(transfer["seconds"], 1e-6))):.1f}MB/s."
+
+
+def staging_stamp(bucket_id: int, /):
+    """
+    Get a stamp that changes whenever a save bucket is updated.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    """
+
+    with bucket(bucket_id) as (_, save):
+        return str(save.updated)
+
+
+def read_staging() -> dict[str, Any]:
+    """Read the staging file."""
+
+    if not os.path.exists(paths.SAVE_STAGING_FILE):
+        return {}
+    return json.loads(pathlib.Path(paths.SAVE_STAGING_FILE).read_bytes())
+
+
+def staging_lock(*, block: bool = True):
+    """
+    Lock staging directories and the staging file, against other processes staging or swapping.
+
+    :param block: Set as false to give up, rather than wait, when another process holds the lock.
+    :returns: A context yielding whether the lock is held. See 'sync.lock'.
+    """
+
+    return sync.lock(f"{paths.SAVE_STAGING_FILE}.lock", block=block)
+
+
+def write_staging(staging: dict[str, Any], /):
+    """
+    Atomically write the staging file.
+
+    :param staging: The file's content.
+    """
+
+    temp = pathlib.Path(f"{paths.SAVE_STAGING_FILE}.ryukit-part")
+    temp.parent.mkdir(parents=True, exist_ok=True)
+    temp.write_text(json.dumps(staging))
+    os.replace(temp, paths.SAVE_STAGING_FILE)
+
+
+def stage_save_bucket(
+    bucket_id: int, /, *, progress: sync.Advance | None = None
+) -> Transfer:
+    """
+    Materialize a save bucket into staging directories beside Ryujinx's, for 'channel_save_bucket' to swap in.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param progress: Called as files are staged. See 'sync.mirror'.
+    :raises ValueError: If the bucket is scoped to titles. Swapping its staging directories in would drop every other title's saves.
+    :returns: A tally of the transfer.
     """
 
-    def rotate[T](values: Sequence[T]):
-        return (iter if upstream else reversed)(values)
+    with bucket(bucket_id) as (_, save):
+        if save.scope is not None:
+            raise ValueError("Scoped buckets aren't staged.")
+    with staging_lock():
+        return fill_staging(bucket_id, progress=progress)
+
+
+def fill_staging(
+    bucket_id: int, /, *, progress: sync.Advance | None = None
+) -> Transfer:
+    """
+    Materialize a save bucket into staging directories, under a held staging lock.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param progress: Called as files are staged. See 'sync.mirror'.
+    :returns: A tally of the transfer.
+    """
+
+    recover_staging()
+    pathlib.Path(paths.SAVE_STAGING_FILE).unlink(missing_ok=True)
+    transfer = channel_save_bucket(
+        bucket_id, upstream=True, staged=True, progress=progress
+    )
+    write_staging({"bucket": bucket_id, "stamp": staging_stamp(bucket_id)})
+    return transfer
+
+
+def swap_staging(journal: dict[str, bool] | None = None, /):
+    """
+    Swap staging directories in for Ryujinx's, through renames.
+
+    Progress is journaled in the staging file, so an interrupted swap can be finished by 'recover_staging'. Swapped-out directories become the next staging directories.
+
+    :param journal: Journal of an interrupted swap, mapping Ryujinx-side directories to whether they have staged content.
+    """
 
-    for source, dest in map(
-        rotate,
-        map(
-            tuple,
+    if journal is None:
+        journal = {
+            live: os.path.exists(f"{live}.ryukit-staged")
+            for live in INTERNAL_CONFIGS["save_buckets"]["flow"].values()
+        }
+        write_staging({"swapping": journal})
+    for live, present in journal.items():
+        if present and not os.path.exists(f"{live}.ryukit-staged"):
+            continue
+        if os.path.exists(live):
+            os.replace(live, f"{live}.ryukit-retired")
+        if present:
+            os.replace(f"{live}.ryukit-staged", live)
+    os.unlink(paths.SAVE_STAGING_FILE)
+    recover_staging()
+
+
+def recover_staging():
+    """Finish any staging swap interrupted by a crash, and recycle swapped-out directories as staging directories."""
+
+    journal = read_staging().get("swapping")
+    if journal is not None:
+        return swap_staging(journal)
+    for live in INTERNAL_CONFIGS["save_buckets"]["flow"].values():
+        if os.path.exists(f"{live}.ryukit-retired"):
+            shutil.rmtree(f"{live}.ryukit-staged", ignore_errors=True)
+            os.replace(f"{live}.ryukit-retired", f"{live}.ryukit-staged")
+
+
+def store_save_bucket(bucket_id: int, /):
+    """
+    Bring a save bucket's on-disk layout in line with the 'saveStorage' configuration.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    """
+
+    manifest_file = paths.SAVE_INSTANCE_MANIFEST.format(id=bucket_id)
+    manifest = store.read_manifest(manifest_file)
+    match USER_CONFIGS["saveStorage"], manifest:
+        case "dedup", None:
+            with store.lock():
+                store.write_manifest(
+                    manifest_file,
+                    {
+                        key: store.ingest(path, consume=True)
+                        for key, path, _ in flows(bucket_id)
+                        if os.path.isdir(path)
+                    },
+                )
+            for _, path, _ in flows(bucket_id):
+                shutil.rmtree(path, ignore_errors=True)
+        case "plain", dict():
+            for key, path, _ in flows(bucket_id):
+                store.materialize(
+                    manifest.get(key), path, mode=USER_CONFIGS["saveTransfer"]
+                )
+            os.unlink(manifest_file)
+            collect_save_garbage()
+        case _:
+            pass
+
+
+def archive_save_bucket(
+    bucket_id: int,
+    tar: tarfile.TarFile,
+    /,
+    *,
+    progress: sync.Advance | None = None,
+):
+    """
+    Add a save bucket's content to an archive, as its plain on-disk layout.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param tar: The archive.
+    :param progress: Called with the size of every file added. See 'sync.mirror'.
+    """
+
+    def count(info: tarfile.TarInfo):
+        if progress and info.isfile():
+            progress(info.size, 0)
+        return info
+
+    arcname = f"save{bucket_id}"
+    manifest = store.read_manifest(
+        paths.SAVE_INSTANCE_MANIFEST.format(id=bucket_id)
+    )
+    if manifest is None:
+        if os.path.exists(paths.SAVE_INSTANCE_DIR.format(id=bucket_id)):
+            tar.add(
+                paths.SAVE_INSTANCE_DIR.format(id=bucket_id),
+                arcname=arcname,
+                filter=count,
+            )
+        return
+    for key, tree in manifest.items():
+        for path in ["", *tree["dirs"]]:
+            info = tarfile.TarInfo(f"{arcname}/{key}/{path}".rstrip("/"))
+            info.type, info.mode = tarfile.DIRTYPE, 0o755
+            tar.addfile(info)
+        for path, entry in tree["files"].items():
+            info = tar.gettarinfo(
+                store.locate(entry["digest"]), f"{arcname}/{key}/{path}"
+            )
+            info.mtime, info.mode = entry["mtime_ns"] / pow(10, 9), 0o644
+            with open(store.locate(entry["digest"]), "rb") as file:
+                tar.addfile(count(info), file)
+
+
+def pack_save_bucket(
+    bucket_id: int,
+    dest: sync.PathLike,
+    /,
+    *,
+    compression: Compression | None = None,
+):
+    """
+    Archive a save bucket into a file of its own, as laid out by 'archive_save_bucket'.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param dest: Path to the file.
+    :param compression: How the file is compressed, if at all. Must be one of 'COMPRESSIONS'.
+    :returns: ID belonging to the subject save bucket.
+    """
+
+    mode: Any = (
+        f"w:{"zst" if compression == "zstd" else compression}"
+        if compression
+        else "w"
+    )
+    with tarfile.open(dest, mode) as tar:
+        archive_save_bucket(bucket_id, tar)
+    return bucket_id
+
+
+def read_dump_index(dump: sync.PathLike, /) -> dict[str, Any]:
+    """
+    Read a dump file's index, without extracting anything else.
+
+    Only the leading member is read, unless the dump predates leading indexes. Indexes of dumps from before buckets were packed into members of their own are brought into the current layout.
+
+    :param dump: Path to the dump file.
+    """
+
+    with tarfile.open(dump) as tar:
+        first = tar.next()
+        index = json.load(
+            cast(
+                IO[bytes],
+                tar.extractfile(
+                    first if first and first.name == "index" else "index"
+                ),
+            )
+        )
+    if isinstance(index, list):
+        return {"version": 1, "saves": index}
+    return index
+
+
+def unpack_save_bucket(
+    bucket_id: int,
+    dump: sync.PathLike,
+    members: Iterable[tarfile.TarInfo],
+    /,
+    *,
+    progress: sync.Advance | None = None,
+):
+    """
+    Extract a save bucket's members from a dump file straight into the bucket, and store it as configured.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    :param dump: Path to the dump file. It's opened afresh, so several buckets can be unpacked at once.
+    :param members: The bucket's members in the dump, whether packed or laid out plainly.
+    :param progress: Called with the size of every member extracted. See 'sync.mirror'.
+    :raises tarfile.FilterError: If a member would land outside the bucket, or isn't a plain file, directory or link within it.
+    """
+
+    def rebase(member: tarfile.TarInfo, path: str):
+        name = member.name.partition("/")[2]
+        return (
+            tarfile.data_filter(member.replace(name=name, deep=False), path)
+            if name
+            else None
+        )
+
+    target = paths.SAVE_INSTANCE_DIR.format(id=bucket_id)
+    with tarfile.open(dump) as tar:
+        for member in members:
+            if re.fullmatch(r"save\d+\.tar", member.name):
+                with tarfile.open(
+                    fileobj=tar.extractfile(member), mode="r|*"
+                ) as pack:
+                    pack.extractall(target, filter=rebase)
+            else:
+                tar.extract(member, target, filter=rebase)
+            if progress:
+                progress(member.size, 0)
+    if os.path.exists(target):
+        store_save_bucket(bucket_id)
+
+
+def save_bucket_size(bucket_id: int, /):
+    """
+    Get the size of a save bucket's content.
+
+    :param bucket_id: ID belonging to the subject save bucket.
+    """
+
+    manifest = store.read_manifest(
+        paths.SAVE_INSTANCE_MANIFEST.format(id=bucket_id)
+    )
+    if manifest is None:
+        return utils.size(
+            paths.SAVE_INSTANCE_DIR.format(id=bucket_id), sizing="dir"
+        )
+    return sum(
+        entry["size"]
+        for tree in manifest.values()
+        for entry in tree["files"].values()
+    )
+
+
+def record_save_bucket(client: sqlalchemy.orm.Session, bucket_id: int, /):
+    """
+    Bring a save bucket's per-file records in line with its content.
+
+    Only files whose sizes or modification times changed since they were last recorded are hashed again.
+
+    :param client: Session with the database.
+    :param bucket_id: ID belonging to the subject save bucket.
+    :returns: The total size of the bucket's files.
+    """
+
+    def fingerprint(item: tuple[tuple[str, str], os.stat_result]):
+        (key, path), info = item
+        row = rows.get((key, path))
+        if (
+            row
+            and row.size == info.st_size
+            and row.mtime_ns == info.st_mtime_ns
+        ):
+            return row.digest
+        return sync.digest(os.path.join(directories[key], path))
+
+    rows = {
+        (row.root, row.path): row
+        for row in client.scalars(
+            sqlalchemy.select(db.RyujinxSaveFile).where(
+                db.RyujinxSaveFile.save_id == bucket_id
+            )
+        )
+    }
+    manifest = store.read_manifest(
+        paths.SAVE_INSTANCE_MANIFEST.format(id=bucket_id)
+    )
+    if manifest is None:
+        directories = {key: path for key, path, _ in flows(bucket_id)}
+        listing = {
+            (key, path): info
+            for key, root in directories.items()
+            if os.path.isdir(root)
+            for path, info in sync.scan(root)[0].items()
+        }
+        with concurrent.futures.ThreadPoolExecutor(
+            USER_CONFIGS["saveTransferWorkers"]
+        ) as pool:
+            entries = {
+                item: store.Entry(
+                    digest=digest, size=info.st_size, mtime_ns=info.st_mtime_ns
+                )
+                for (item, info), digest in zip(
+                    listing.items(), pool.map(fingerprint, listing.items())
+                )
+            }
+    else:
+        entries = {
+            (key, path): entry
+            for key, tree in manifest.items()
+            for path, entry in tree["files"].items()
+        }
+    for key in rows.keys() - entries.keys():
+        client.delete(rows[key])
+    for (key, path), entry in entries.items():
+        row = rows.get((key, path))
+        if row is None:
+            client.add(
+                db.RyujinxSaveFile(
+                    save_id=bucket_id, root=key, path=path, **entry
+                )
+            )
+            continue
+        row.size, row.mtime_ns, row.digest = (
+            entry["size"],
+            entry["mtime_ns"],
+            entry["digest"],
+        )
+    return sum(entry["size"] for entry in entries.values())
+
+
+def collect_save_garbage():
+    """
+    Delete stored objects that no save bucket references.
+
+    :returns: The amount of deleted objects.
+    """
+
+    return store.collect_garbage(
+        filter(
+            None,
             map(
-                lambda p: map(pathlib.Path, p),
-                (
-                    (x.format(id=bucket_id), y)
-                    for x, y in INTERNAL_CONFIGS["save_buckets"][
-                        "flow"
-                    ].items()
+                store.read_manifest,
+                glob.glob(
+                    glob.escape(paths.SAVE_INSTANCE_MANIFEST).format(id="*")
                 ),
             ),
-        ),
-    ):
-        if dest.exists():
-            shutil.rmtree(dest)
-        if not source.exists():
-            continue
-        shutil.copytree(source, dest)
+        )
+    )
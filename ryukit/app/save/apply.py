@@ -8,7 +8,9 @@ from ...app.save.__context__ import (
     channel_save_bucket,
     command,
     console,
+    describe_transfer,
 )
+from ...libs import components
 
 __all__ = ["apply"]
 
@@ -25,7 +27,13 @@ def apply(
     WARNING: This will overwrite files for Ryujinx. Unless certain, save your data.
     """
 
-    channel_save_bucket(bucket_, upstream=True)
+    progress = components.Progress("Applying save...")
+    with components.Live(progress, console=console, transient=True):
+        transfer = channel_save_bucket(
+            bucket_, upstream=True, progress=progress.advance
+        )
     with bucket(bucket_) as (_, save):
         save.last_used = datetime.datetime.now(datetime.timezone.utc)
-    console.print("Save applied.")
+    console.print(
+        "Save applied.", f"└── {describe_transfer(transfer)}", sep="\n"
+    )
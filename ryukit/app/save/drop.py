@@ -3,7 +3,12 @@ from typing import Annotated
 
 import typer
 
-from ...app.save.__context__ import bucket, command, console
+from ...app.save.__context__ import (
+    bucket,
+    collect_save_garbage,
+    command,
+    console,
+)
 from ...libs import paths
 
 __all__ = ["drop"]
@@ -32,3 +37,4 @@ def drop(
                 paths.SAVE_INSTANCE_DIR.format(id=save.id), ignore_errors=True
             )
             console.print(f"Deleted bucket '{save.id}'.")
+    collect_save_garbage()
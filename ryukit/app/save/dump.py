@@ -1,14 +1,27 @@
+import concurrent.futures
+import datetime
 import io
+import os
 import pathlib
 import tarfile
+import tempfile
 from typing import Annotated, Any
 
+import click
 import sqlalchemy
 import typer
 
 from ... import utils
-from ...app.save.__context__ import command, console
-from ...libs import components, db, paths
+from ...app.save.__context__ import (
+    COMPRESSIONS,
+    USER_CONFIGS,
+    Compression,
+    command,
+    console,
+    pack_save_bucket,
+    read_dump_index,
+)
+from ...libs import components, db
 
 __all__ = ["dump"]
 
@@ -18,45 +31,102 @@ def dump(
     into: Annotated[
         pathlib.Path, typer.Argument(help="Where to dump your buckets.")
     ] = pathlib.Path("saves.ryukitdmp"),
+    compression: Annotated[
+        Compression | None,
+        typer.Option(
+            help="Compress each bucket with this codec.",
+            click_type=click.Choice(COMPRESSIONS),
+            show_default=False,
+        ),
+    ] = None,
+    since: Annotated[
+        pathlib.Path | None,
+        typer.Option(
+            help="Only dump what changed after this earlier dump, extending it.",
+            exists=True,
+            dir_okay=False,
+            show_default=False,
+        ),
+    ] = None,
 ):
-    """Dump your save buckets into a recovery file."""
+    """
+    Dump your save buckets into a recovery file.
+
+    The file is written as it's built, with every bucket archived, and compressed, on one of 'saveTransferWorkers' threads, into a member of its own. It leads with an index of its buckets and the offsets of their members, so they can be listed and restored selectively without reading the rest of the file.
+
+    Incremental dumps, made with 'since', only hold the buckets updated since the second their base dump was made, and list the buckets deleted since. Restore them after their base, in order.
+    """
 
+    base = read_dump_index(since) if since else None
+    if base is not None and "watermark" not in base:
+        console.print(
+            f"[error]Dump '{since}' can't be extended.",
+            "└── Dump it again with this version.",
+            sep="\n",
+        )
+        raise typer.Exit(1)
+    into.parent.mkdir(parents=True, exist_ok=True)
+    progress = components.Progress("Collecting data...")
+    watermark = datetime.datetime.now(datetime.timezone.utc).replace(
+        tzinfo=None, microsecond=0
+    )
+    with db.client() as client:
+        saves = list(
+            map(
+                utils.model_to_dict,
+                client.scalars(
+                    sqlalchemy.select(db.RyujinxSave).where(
+                        sqlalchemy.true()
+                        if base is None
+                        else sqlalchemy.func.datetime(db.RyujinxSave.updated)
+                        >= sqlalchemy.func.datetime(base["watermark"])
+                    )
+                ),
+            )
+        )
+        ids = list(client.scalars(sqlalchemy.select(db.RyujinxSave.id)))
+    index: dict[str, Any] = {
+        "version": 3,
+        "compression": compression,
+        "watermark": watermark,
+        "since": base and base["watermark"],
+        "ids": ids,
+        "deletions": sorted(set(base["ids"]) - set(ids)) if base else [],
+        "saves": saves,
+        "packs": {str(save["id"]): pow(2, 63) for save in saves},
+    }
+    reserved = len(utils.json_dumps(index).encode())
+    progress.advance(0, sum(save["size"] for save in saves))
     with (
-        io.BytesIO() as buffer,
-        tarfile.TarFile(fileobj=buffer, mode="w") as tar,
-        components.Status(
-            "Collecting data...", spinner="dots2", spinner_style="none"
-        ),
+        tempfile.TemporaryDirectory(dir=into.parent) as temp_dir,
+        concurrent.futures.ThreadPoolExecutor(
+            USER_CONFIGS["saveTransferWorkers"]
+        ) as pool,
+        tarfile.open(into, "w") as tar,
     ):
-        with db.client() as client:
-            save_dicts: list[dict[str, Any]] = []
-            any(
-                map(
-                    lambda _: False,
-                    (
-                        (
-                            save_dicts.append(utils.model_to_dict(save)),
-                            (
-                                tar.add(
-                                    paths.SAVE_INSTANCE_DIR.format(id=save.id),
-                                    arcname=f"save{save.id}",
-                                )
-                                if pathlib.Path(
-                                    paths.SAVE_INSTANCE_DIR.format(id=save.id)
-                                ).exists()
-                                else None
-                            ),
-                        )
-                        for save in client.scalars(
-                            sqlalchemy.select(db.RyujinxSave)
-                        )
-                    ),
-                )
-            )
-        with io.BytesIO(utils.json_dumps(save_dicts).encode()) as save_buffer:
-            info = tar.tarinfo("index")
-            info.size = len(save_buffer.getvalue())
-            tar.addfile(info, save_buffer)
-        into.parent.mkdir(exist_ok=True)
-        into.write_bytes(buffer.getvalue())
+        info = tar.tarinfo("index")
+        info.size = reserved
+        index_offset = tar.offset + len(
+            info.tobuf(tar.format, tar.encoding, tar.errors)
+        )
+        tar.addfile(info, io.BytesIO(b" " * reserved))
+        packs = {
+            pool.submit(
+                pack_save_bucket,
+                save["id"],
+                f"{temp_dir}/{save["id"]}",
+                compression=compression,
+            ): save
+            for save in saves
+        }
+        with components.Live(progress, console=console, transient=True):
+            for pack in concurrent.futures.as_completed(packs):
+                pack_file = f"{temp_dir}/{pack.result()}"
+                index["packs"][str(pack.result())] = tar.offset
+                tar.add(pack_file, arcname=f"save{pack.result()}.tar")
+                os.unlink(pack_file)
+                progress.advance(packs[pack]["size"])
+    with open(into, "r+b") as file:
+        file.seek(index_offset)
+        file.write(utils.json_dumps(index).encode().ljust(reserved))
     console.print(f"Dump file created at '{into}'.")
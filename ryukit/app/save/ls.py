@@ -1,8 +1,9 @@
-from typing import Annotated
+from typing import Annotated, Any
 
 import rich
 import rich.table
 import sqlalchemy
+import sqlalchemy.orm
 import typer
 
 from ... import utils
@@ -27,11 +28,83 @@ def ls(
     """
     List your save buckets.
 
-    When keywords are provided, only save entries matching those keywords are listed.
+    When keywords are provided, only save entries matching every keyword are listed. Keywords match the start of a word in a label, or of a timestamp, and entries are ranked by how well their labels match. With 'wildcards', keywords are matched whole, as SQL 'LIKE' patterns, instead.
     """
 
-    filter_by = filter_by or []
-    pad = "" if wildcards else "%"
+    def prefixed(column: sqlalchemy.orm.InstrumentedAttribute[Any], word: str):
+        return sqlalchemy.and_(
+            column >= sqlalchemy.literal(word, sqlalchemy.String),
+            column
+            < sqlalchemy.literal(
+                f"{word[:-1]}{chr(ord(word[-1]) + 1)}", sqlalchemy.String
+            ),
+        )
+
+    def phrase(word: str):
+        return f'"{word.replace('"', '""')}"*'
+
+    filter_by = [word for word in filter_by or [] if word]
+    query = sqlalchemy.select(db.RyujinxSave)
+    if wildcards:
+        query = query.where(
+            *(
+                sqlalchemy.or_(
+                    *(
+                        attr.like(word)
+                        for attr in [
+                            db.RyujinxSave.created,
+                            db.RyujinxSave.updated,
+                            db.RyujinxSave.last_used,
+                            sqlalchemy.func.lower(db.RyujinxSave.label),
+                        ]
+                    )
+                )
+                for word in filter_by
+            )
+        )
+    elif filter_by:
+        ranks = (
+            sqlalchemy.select(
+                db.LABEL_SEARCH.c.rowid,
+                sqlalchemy.func.bm25(
+                    sqlalchemy.literal_column(db.LABEL_SEARCH.name)
+                ).label("rank"),
+            )
+            .where(
+                sqlalchemy.literal_column(db.LABEL_SEARCH.name).match(
+                    " OR ".join(map(phrase, filter_by))
+                )
+            )
+            .subquery()
+        )
+        query = (
+            query.outerjoin(ranks, ranks.c.rowid == db.RyujinxSave.id)
+            .where(
+                *(
+                    sqlalchemy.or_(
+                        db.RyujinxSave.id.in_(
+                            sqlalchemy.select(db.LABEL_SEARCH.c.rowid).where(
+                                sqlalchemy.literal_column(
+                                    db.LABEL_SEARCH.name
+                                ).match(phrase(word))
+                            )
+                        ),
+                        *(
+                            prefixed(attr, word)
+                            for attr in [
+                                db.RyujinxSave.created,
+                                db.RyujinxSave.updated,
+                                db.RyujinxSave.last_used,
+                            ]
+                        ),
+                    )
+                    for word in filter_by
+                )
+            )
+            .order_by(
+                sqlalchemy.func.coalesce(ranks.c.rank, 0), db.RyujinxSave.id
+            )
+        )
     table = components.Table(
         rich.table.Column("ID", justify="center"),
         rich.table.Column("LABEL"),
@@ -41,7 +114,7 @@ def ls(
         rich.table.Column("SIZE", justify="center"),
     )
     with db.client() as client:
-        any(
+        for save in client.scalars(query):
             table.add_row(
                 *map(
                     str,
@@ -55,28 +128,4 @@ def ls(
                 ),
                 f"{utils.megabytes(save.size):.1f}MB",
             )
-            for save in client.scalars(
-                sqlalchemy.select(db.RyujinxSave).where(
-                    sqlalchemy.and_(
-                        True,
-                        *(
-                            sqlalchemy.or_(
-                                *(
-                                    attr.like(f"'{pad}' || {word} || '{pad}'")
-                                    for attr in [
-                                        db.RyujinxSave.created,
-                                        db.RyujinxSave.updated,
-                                        db.RyujinxSave.last_used,
-                                        sqlalchemy.func.lower(
-                                            db.RyujinxSave.label
-                                        ),
-                                    ]
-                                )
-                            )
-                            for word in filter_by
-                        ),
-                    )
-                )
-            )
-        )
     console.print(table)
@@ -1,3 +1,7 @@
+import re
+import shutil
+import subprocess
+import sys
 from typing import Annotated
 
 import typer
@@ -5,11 +9,13 @@ import typer
 from ... import utils
 from ...app.save.__context__ import (
     bucket,
-    channel_save_bucket,
     command,
     console,
+    describe_transfer,
+    flows,
+    pull_save_bucket,
 )
-from ...libs import paths
+from ...libs import components
 
 __all__ = ["pull"]
 
@@ -20,16 +26,81 @@ def pull(
         int,
         typer.Argument(help="ID of bucket to pull into.", show_default=False),
     ],
+    stage: Annotated[
+        bool,
+        typer.Option(
+            help="Stage the bucket in the background afterwards, for a near-instant apply."
+        ),
+    ] = False,
+    title: Annotated[
+        list[str] | None,
+        typer.Option(
+            help="Save-data ID of a title, as named by its directories under Ryujinx's save directories. Scopes the bucket to the titles given, so it only holds, and applies, their saves. Repeat to scope several.",
+            show_default=False,
+        ),
+    ] = None,
+    all_titles: Annotated[
+        bool,
+        typer.Option(
+            "--all-titles",
+            help="Unscope the bucket, so it holds, and applies, every title's saves.",
+        ),
+    ] = False,
 ):
-    """Pull data from Ryujinx into a save bucket."""
+    """
+    Pull data from Ryujinx into a save bucket.
 
-    channel_save_bucket(into, upstream=False)
-    with bucket(into) as (_, save):
-        save.size = utils.size(
-            paths.SAVE_INSTANCE_DIR.format(id=into), sizing="dir"
+    Buckets scoped to titles only pull their titles' saves. Rescoping, or unscoping, a bucket clears it before the pull.
+    """
+
+    if title is not None and all_titles:
+        console.print(
+            "[error]Can't scope and unscope a bucket at once.",
+            "└── Pass either 'title' or 'all-titles'.",
+            sep="\n",
         )
+        raise typer.Exit(1)
+    for name in title or []:
+        if re.fullmatch(r"[\w.-]+", name) and name not in {".", ".."}:
+            continue
+        console.print(
+            f"[error]Malformed title '{name}'.",
+            "└── Titles are named by their save-data directories.",
+            sep="\n",
+        )
+        raise typer.Exit(1)
+    scope = None if title is None else sorted(set(title))
+    with bucket(into) as (_, save):
+        if (title is not None or all_titles) and scope != save.scope:
+            for _, path, _ in flows(into):
+                shutil.rmtree(path, ignore_errors=True)
+            save.scope = scope
+        scoped = save.scope is not None
+    progress = components.Progress("Pulling save...")
+    with components.Live(progress, console=console, transient=True):
+        transfer = pull_save_bucket(into, progress=progress.advance)
+    with bucket(into) as (_, save):
         console.print(
             "Updated bucket.",
+            f"├── {describe_transfer(transfer)}",
             f"└── Bucket is now of size {utils.megabytes(save.size):.1f}MB.",
             sep="\n",
         )
+    if not stage:
+        return
+    if scoped:
+        console.print("Scoped buckets apply without staging.")
+        return
+    subprocess.Popen(
+        [
+            sys.executable,
+            *([] if getattr(sys, "frozen", False) else ["-m", "ryukit"]),
+            "save",
+            "stage",
+            str(into),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    console.print("Staging bucket in the background.")
@@ -1,14 +1,26 @@
+import concurrent.futures
 import datetime
-import json
+import functools
+import itertools
 import pathlib
+import re
 import shutil
 import tarfile
-import tempfile
-from typing import Annotated, Any
+from typing import Annotated, cast
 
+import rich.table
+import sqlalchemy
 import typer
 
-from ...app.save.__context__ import command, console
+from ... import utils
+from ...app.save.__context__ import (
+    USER_CONFIGS,
+    collect_save_garbage,
+    command,
+    console,
+    read_dump_index,
+    unpack_save_bucket,
+)
 from ...libs import components, db, paths
 
 __all__ = ["restore"]
@@ -16,39 +28,208 @@ __all__ = ["restore"]
 
 @command("restore")
 def restore(
-    dump: Annotated[
-        pathlib.Path,
-        typer.Argument(help="Dump file path.", exists=True, dir_okay=False),
+    dumps: Annotated[
+        list[pathlib.Path],
+        typer.Argument(
+            help="Dump file paths, a full dump followed by its increments, in order.",
+            exists=True,
+            dir_okay=False,
+        ),
     ],
+    only: Annotated[
+        list[int] | None,
+        typer.Option(
+            help="Dump IDs of the buckets to restore. Repeat to pick several.",
+            show_default=False,
+        ),
+    ] = None,
+    list_: Annotated[
+        bool,
+        typer.Option(
+            "--list", help="List the dumped buckets, rather than restore them."
+        ),
+    ] = False,
 ):
-    """Restore saves from a dump file."""
+    """
+    Restore saves from a dump file, or a chain of them.
 
-    with (
-        components.Status(
-            "Restoring buckets...", spinner="dots2", spinner_style="none"
-        ),
-        tempfile.TemporaryDirectory() as temp_dir,
-        db.client() as client,
-    ):
-        with tarfile.open(dump) as tar:
-            tar.extractall(temp_dir)
-        saves: list[dict[str, Any]] = json.loads(
-            (pathlib.Path(temp_dir) / "index").read_bytes()
+    Increments update the buckets restored from the dumps before them, and delete the buckets they list as deleted. Buckets picked through 'only' are read straight from their offsets, in dumps that lead with an index. Older dumps are read through, and restored, as well.
+
+    Every dump's buckets are recorded at once, then extracted straight into place, side by side, by 'saveTransferWorkers' threads. A restore that fails leaves no buckets behind.
+    """
+
+    def picked(dump_id: int):
+        return only is None or dump_id in only
+
+    indexes = list(map(read_dump_index, dumps))
+    for dump, index, previous in zip(dumps, indexes, [None, *indexes]):
+        if index.get("since") == (previous and previous.get("watermark")):
+            continue
+        console.print(
+            f"[error]Dump '{dump}' doesn't extend the dump before it.",
+            "└── Restore a full dump, followed by its increments, in order.",
+            sep="\n",
         )
-        for save_args in saves:
-            save_args.update(
-                {
-                    key: save_args[key]
-                    and datetime.datetime.fromisoformat(save_args[key])
-                    for key in ("created", "updated", "last_used")
-                }
+        raise typer.Exit(1)
+    if list_:
+        for dump, index in zip(dumps, indexes):
+            table = components.Table(
+                rich.table.Column("ID", justify="center"),
+                rich.table.Column("LABEL"),
+                rich.table.Column("UPDATED"),
+                rich.table.Column("SIZE", justify="center"),
+                title=str(dump),
+            )
+            deletions = [
+                f"'{dump_id}'"
+                for dump_id in index.get("deletions", [])
+                if picked(dump_id)
+            ]
+            if deletions:
+                table.caption = f"Deletes {", ".join(deletions)}."
+            for save in index["saves"]:
+                if picked(save["id"]):
+                    table.add_row(
+                        str(save["id"]),
+                        save["label"],
+                        save["updated"],
+                        f"{utils.megabytes(save["size"]):.1f}MB",
+                    )
+            console.print(table)
+        return
+    restored: dict[int, int] = {}
+    progress = components.Progress("Restoring buckets...")
+    try:
+        with (
+            components.Live(progress, console=console, transient=True),
+            db.client() as client,
+            concurrent.futures.ThreadPoolExecutor(
+                USER_CONFIGS["saveTransferWorkers"]
+            ) as pool,
+        ):
+            for dump, index in zip(dumps, indexes):
+                saves = [save for save in index["saves"] if picked(save["id"])]
+                with tarfile.open(dump) as tar:
+                    if "packs" in index:
+                        tar.next()  # The leading index.
+                        members: dict[int, list[tarfile.TarInfo]] = {}
+                        for save in saves:
+                            # Headers are read from wherever the offset points.
+                            tar.offset = index["packs"][str(save["id"])]
+                            members[save["id"]] = [
+                                cast(tarfile.TarInfo, tar.next())
+                            ]
+                    else:
+                        members = {save["id"]: [] for save in saves}
+                        for member in tar.getmembers():
+                            match = re.match(r"save(\d+)", member.name)
+                            if match and int(match[1]) in members:
+                                members[int(match[1])].append(member)
+                progress.advance(
+                    0,
+                    sum(
+                        member.size
+                        for bucket_members in members.values()
+                        for member in bucket_members
+                    ),
+                )
+                for save in saves:
+                    save.update(
+                        {
+                            key: save[key]
+                            and datetime.datetime.fromisoformat(save[key])
+                            for key in ("created", "updated", "last_used")
+                        }
+                    )
+                for save in saves:
+                    if save["id"] not in restored:
+                        continue
+                    client.execute(
+                        sqlalchemy.update(db.RyujinxSave)
+                        .where(db.RyujinxSave.id == restored[save["id"]])
+                        .values({**save, "id": restored[save["id"]]})
+                    )
+                    shutil.rmtree(
+                        paths.SAVE_INSTANCE_DIR.format(
+                            id=restored[save["id"]]
+                        ),
+                        ignore_errors=True,
+                    )
+                    console.print(
+                        f"Updated 'save{save["id"]}' under ID '{restored[save["id"]]}'."
+                    )
+                fresh = [save for save in saves if save["id"] not in restored]
+                if fresh:
+                    restored.update(
+                        zip(
+                            (save["id"] for save in fresh),
+                            client.scalars(
+                                sqlalchemy.insert(db.RyujinxSave).returning(
+                                    db.RyujinxSave.id,
+                                    sort_by_parameter_order=True,
+                                ),
+                                [
+                                    {
+                                        key: value
+                                        for key, value in save.items()
+                                        if key != "id"
+                                    }
+                                    for save in fresh
+                                ],
+                            ),
+                        )
+                    )
+                for save in fresh:
+                    # Left behind by restores that were cut short.
+                    shutil.rmtree(
+                        paths.SAVE_INSTANCE_DIR.format(
+                            id=restored[save["id"]]
+                        ),
+                        ignore_errors=True,
+                    )
+                    console.print(
+                        f"Restored 'save{save["id"]}' under ID '{restored[save["id"]]}'."
+                    )
+                try:
+                    for _ in pool.map(
+                        functools.partial(
+                            unpack_save_bucket, progress=progress.advance
+                        ),
+                        [restored[dump_id] for dump_id in members],
+                        itertools.repeat(dump),
+                        members.values(),
+                    ):
+                        pass
+                except tarfile.FilterError as e:
+                    console.print(
+                        f"[error]Dump '{dump}' holds an unsafe member. {e}.",
+                        "└── Nothing was restored. Only restore dumps made by RyuKit.",
+                        sep="\n",
+                    )
+                    raise typer.Exit(1)
+                for dump_id in index.get("deletions", []):
+                    if dump_id not in restored or not picked(dump_id):
+                        continue
+                    client.execute(
+                        sqlalchemy.delete(db.RyujinxSave).where(
+                            db.RyujinxSave.id == restored[dump_id]
+                        )
+                    )
+                    shutil.rmtree(
+                        paths.SAVE_INSTANCE_DIR.format(
+                            id=restored.pop(dump_id)
+                        ),
+                        ignore_errors=True,
+                    )
+    except BaseException:
+        # The buckets' records were rolled back, and their IDs are free to be
+        # taken again.
+        for bucket_id in restored.values():
+            shutil.rmtree(
+                paths.SAVE_INSTANCE_DIR.format(id=bucket_id),
+                ignore_errors=True,
             )
-            save_path = pathlib.Path(temp_dir) / f"save{save_args.pop("id")}"
-            save = db.RyujinxSave(**save_args)
-            client.add(save)
-            client.flush([save])
-            console.print(f"Restored '{save_path.stem}' under ID '{save.id}'.")
-            if not save_path.exists():
-                continue
-            shutil.move(save_path, paths.SAVE_INSTANCE_DIR.format(id=save.id))
-    console.print(f"Added '{len(saves)}' bucket(s).")
+        raise
+    finally:
+        collect_save_garbage()
+    console.print(f"Added '{len(restored)}' bucket(s).")
@@ -0,0 +1,41 @@
+from typing import Annotated
+
+import typer
+
+from ...app.save.__context__ import (
+    command,
+    console,
+    describe_transfer,
+    stage_save_bucket,
+)
+
+__all__ = ["stage"]
+
+
+@command("stage")
+def stage(
+    bucket_: Annotated[
+        int,
+        typer.Argument(
+            metavar="BUCKET", help="ID of bucket to stage.", show_default=False
+        ),
+    ],
+):
+    """
+    Prepare a save bucket for a near-instant apply.
+
+    Staged buckets are only swapped in when 'saveApply' is 'staged' in ryukitconfig.json. Only one bucket is staged at a time. Buckets scoped to titles apply without staging.
+    """
+
+    try:
+        transfer = stage_save_bucket(bucket_)
+    except ValueError:
+        console.print(
+            f"[error]Bucket '{bucket_}' is scoped to titles.",
+            "└── Scoped buckets apply without staging.",
+            sep="\n",
+        )
+        raise typer.Exit(1)
+    console.print(
+        "Bucket staged.", f"└── {describe_transfer(transfer)}", sep="\n"
+    )
@@ -1,3 +1,4 @@
+import concurrent.futures
 import datetime
 import time
 from typing import Annotated, cast
@@ -6,8 +7,15 @@ import psutil
 import typer
 
 from .. import utils
-from ..libs import components
-from .__context__ import INTERNAL_CONFIGS, bucket, command, console
+from ..libs import components, watch
+from .__context__ import (
+    INTERNAL_CONFIGS,
+    USER_CONFIGS,
+    bucket,
+    command,
+    console,
+)
+from .save.__context__ import Transfer, pull_save_bucket
 from .save.pull import pull
 
 __all__ = ["track"]
@@ -25,6 +33,8 @@ def track(
     """
     Monitor a Ryujinx play session and save changes into a bucket.
 
+    Changes are checkpointed into the bucket in the background, once they settle, every 'trackCheckpointInterval' seconds or 'trackCheckpointChange' megabytes of change.
+
     WARNING
     -------
     * This will surely invoke the save-pull command on whichever bucket 'into' points to.
@@ -57,21 +67,63 @@ def track(
             "",
             ". playtime: {playtime}",
             ". session diff: {sign}{session_diff:.1f}MB[/]",
+            ". checkpoints: {checkpoints}",
             "",
         ]
     )
+    interval = USER_CONFIGS["trackCheckpointInterval"]
+    threshold = USER_CONFIGS["trackCheckpointChange"] * pow(2, 20)
+    checkpoint: concurrent.futures.Future[Transfer] | None = None
+    checkpoints = {"count": 0, "churn": 0, "time": time.monotonic()}
+    checkpointed = 0
+    change = {"churn": 0, "time": time.monotonic()}
     try:
-        with components.Live(console=console) as live:
+        with (
+            concurrent.futures.ThreadPoolExecutor(1) as checkpointer,
+            components.Live(console=console) as live,
+            watch.watch(
+                INTERNAL_CONFIGS["save_buckets"]["flow"].values()
+            ) as poll,
+        ):
             while (
                 psutil.pid_exists(process.pid)
                 and process.status() != psutil.STATUS_ZOMBIE
             ):
-                size_diff = sum(
-                    utils.size(path, sizing="dir")
-                    for path in INTERNAL_CONFIGS["save_buckets"][
-                        "flow"
-                    ].values()
-                ) - cast(int, initials["size"])
+                tally, now = poll(), time.monotonic()
+                if checkpoint is not None and checkpoint.done():
+                    try:
+                        checkpoint.result()
+                    except Exception as e:
+                        console.print(
+                            f"[error]Checkpoint failed. {e}",
+                            "└── Its changes are left to the next checkpoint.",
+                            sep="\n",
+                        )
+                        checkpoints.update(
+                            count=checkpoints["count"] - 1, churn=checkpointed
+                        )
+                    checkpoint = None
+                if tally["churn"] != change["churn"]:
+                    change.update(churn=tally["churn"], time=now)
+                pending = tally["churn"] - checkpoints["churn"]
+                if (
+                    pending
+                    and (checkpoint is None or checkpoint.done())
+                    and now - change["time"]
+                    >= INTERNAL_CONFIGS["track"]["checkpoint_quiet"]
+                    and (
+                        (interval and now - checkpoints["time"] >= interval)
+                        or (threshold and pending >= threshold)
+                    )
+                ):
+                    checkpointed = checkpoints["churn"]
+                    checkpoints.update(
+                        count=checkpoints["count"] + 1,
+                        churn=tally["churn"],
+                        time=now,
+                    )
+                    checkpoint = checkpointer.submit(pull_save_bucket, into)
+                size_diff = tally["bytes"] - cast(int, initials["size"])
                 live.update(
                     status.format(
                         playtime=str(
@@ -80,6 +132,7 @@ def track(
                         ).split(".")[0],
                         session_diff=utils.megabytes(size_diff),
                         sign="[green]" if size_diff < 0 else "[red]+",
+                        checkpoints=checkpoints["count"],
                     )
                 )
                 time.sleep(0.2)
@@ -0,0 +1,103 @@
+"""Archive extraction."""
+
+import os
+import pathlib
+import shutil
+import threading
+import zipfile
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import Executor
+
+from . import sync
+
+__all__ = ["extract", "crc32"]
+
+
+def crc32(path: sync.PathLike, /):
+    """
+    Get a file's CRC-32 checksum.
+
+    :param path: Path to the file.
+    """
+
+    checksum = 0
+    with open(path, "rb") as file:
+        while chunk := file.read(pow(2, 20)):
+            checksum = zlib.crc32(chunk, checksum)
+    return checksum
+
+
+def extract(
+    source: sync.PathLike,
+    routes: Mapping[str, sync.PathLike],
+    /,
+    *,
+    pool: Executor | None = None,
+    progress: sync.Advance | None = None,
+):
+    """
+    Extract a zip archive's members straight to where they belong, writing only what differs.
+
+    Files whose sizes and CRC-32 checksums match their members are left untouched. Every write lands through a rename, so no file is ever left half-written.
+
+    :param source: Path to the archive.
+    :param routes: Destination directories, keyed by the archive directories extracted into them.
+    :param pool: Workers to fan member extraction out to. Each opens its own handle on the archive.
+    :param progress: Called as members are settled. See 'sync.mirror'.
+    :returns: A tally of the written files.
+    """
+
+    def open_archive() -> zipfile.ZipFile:
+        if not hasattr(local, "archive"):
+            local.archive = zipfile.ZipFile(source)
+            handles.append(local.archive)
+        return local.archive
+
+    def settle(member: tuple[zipfile.ZipInfo, pathlib.Path]):
+        info, target = member
+        if (
+            target.is_file()
+            and target.stat().st_size == info.file_size
+            and crc32(target) == info.CRC
+        ):
+            if progress:
+                progress(info.file_size, 0)
+            return None
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f"{target.name}.ryukit-part")
+        with open_archive().open(info) as reader, open(temp, "wb") as writer:
+            shutil.copyfileobj(reader, writer, pow(2, 20))
+        os.replace(temp, target)
+        if progress:
+            progress(info.file_size, 0)
+        return info.file_size
+
+    local = threading.local()
+    handles: list[zipfile.ZipFile] = []
+    members: list[tuple[zipfile.ZipInfo, pathlib.Path]] = []
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            prefix, _, rest = info.filename.partition("/")
+            if prefix not in routes or not rest:
+                continue
+            root = pathlib.Path(routes[prefix]).resolve()
+            target = root.joinpath(rest).resolve()
+            if not target.is_relative_to(root):
+                continue
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+            members.append((info, target))
+    if progress:
+        progress(0, sum(info.file_size for info, _ in members))
+    try:
+        written = [
+            size
+            for size in (pool.map if pool else map)(settle, members)
+            if size is not None
+        ]
+    finally:
+        for handle in handles:
+            handle.close()
+    return sync.Report(files=len(written), bytes=sum(written))
@@ -1,14 +1,70 @@
 """UI components."""
 
 import functools
+import threading
+import time
 
 import rich
 import rich.box
 import rich.live
+import rich.progress_bar
 import rich.status
 import rich.table
 
-__all__ = ["Status", "Live", "Table"]
+from .. import utils
+
+__all__ = ["Status", "Live", "Table", "Progress"]
 Status = functools.partial(rich.status.Status, refresh_per_second=10)
 Live = functools.partial(rich.live.Live, refresh_per_second=10)
 Table = functools.partial(rich.table.Table, box=rich.box.SIMPLE)
+
+
+class Progress:
+    """
+    Byte counters for a long-running transfer, rendered apart from it.
+
+    Transfer code only bumps the counters, through 'advance', while a 'Live' display samples them at its own refresh rate.
+    """
+
+    def __init__(self, description: str, /):
+        """
+        :param description: What the transfer is doing.
+        """
+
+        self.description = description
+        self.done = self.total = 0
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def advance(self, done: int, expected: int = 0, /):
+        """
+        Bump the counters.
+
+        :param done: Bytes just transferred.
+        :param expected: Bytes just found to need transferring.
+        """
+
+        with self.lock:
+            self.done += done
+            self.total += expected
+
+    def __rich__(self):
+        with self.lock:
+            done, total = self.done, self.total
+        rate = done / max(time.monotonic() - self.start, 1e-6)
+        remaining = (
+            time.strftime("%H:%M:%S", time.gmtime((total - done) / rate))
+            if rate and total > done
+            else "--:--:--"
+        )
+        grid = rich.table.Table.grid(padding=(0, 1))
+        grid.add_row(
+            self.description,
+            rich.progress_bar.ProgressBar(
+                total=max(total, done) or None, completed=done, width=30
+            ),
+            f"{utils.megabytes(done):.1f}/{utils.megabytes(max(total, done)):.1f}MB",
+            f"{utils.megabytes(int(rate)):.1f}MB/s",
+            f"ETA {remaining}",
+        )
+        return grid
@@ -0,0 +1,126 @@
+"""Configuration checks and persistence."""
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from collections.abc import Mapping
+from typing import Any, cast
+
+from . import paths, sync
+
+__all__ = ["fingerprint", "validate", "persist", "save"]
+
+
+def fingerprint(configs: Mapping[str, Any], schema: str, /):
+    """
+    Digest a configuration together with the schema it's checked against.
+
+    :param configs: The configuration.
+    :param schema: The JSON schema's text.
+    """
+
+    return hashlib.sha256(
+        json.dumps([configs, schema], sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def validate(configs: Mapping[str, Any], schema: str, /):
+    """
+    Check a configuration against a JSON schema, unless neither changed since the last check that passed.
+
+    Passing checks are remembered by their fingerprint, in 'paths.CONFIG_STAMP_FILE', so unchanged configurations are accepted without loading a validator.
+
+    :param configs: The configuration.
+    :param schema: The JSON schema's text.
+    :raises ValueError: If the configuration doesn't match the schema, with the mismatch's message and JSON path as arguments.
+    :returns: Whether the check was run.
+    """
+
+    digest = fingerprint(configs, schema)
+    stamp = pathlib.Path(paths.CONFIG_STAMP_FILE)
+    if stamp.is_file() and stamp.read_text() == digest:
+        return False
+
+    import jsonschema
+
+    try:
+        cast(Any, jsonschema.Draft7Validator(json.loads(schema))).validate(
+            configs
+        )
+    except jsonschema.ValidationError as e:
+        raise ValueError(e.message, e.json_path) from e
+    persist(stamp, digest)
+    return True
+
+
+def persist(path: sync.PathLike, content: str, /):
+    """
+    Write text into a file, unless it already holds it.
+
+    The text is written into a temporary file beside the target, then renamed over it, so concurrent readers and writers only ever see whole files.
+
+    :param path: Path to the file.
+    :param content: The text.
+    :returns: Whether the file was written.
+    """
+
+    target = pathlib.Path(path)
+    if target.is_file() and target.read_text() == content:
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w",
+        dir=target.parent,
+        prefix=f"{target.name}.",
+        suffix=".ryukit-part",
+        delete=False,
+    ) as file:
+        try:
+            file.write(content)
+        except BaseException:
+            file.close()
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, target)
+    return True
+
+
+def save(
+    path: sync.PathLike,
+    loaded: Mapping[str, Any],
+    current: Mapping[str, Any],
+    /,
+):
+    """
+    Write a configuration's changes into its file.
+
+    Only entries changed since the configuration was loaded are written, over whatever the file holds by then, so changes other processes made in the meantime are kept. The file is re-read, and replaced, under a lock. A missing file is written in full.
+
+    :param path: Path to the file.
+    :param loaded: The configuration as it was loaded.
+    :param current: The configuration now.
+    :returns: Whether the file was written.
+    """
+
+    changed = {
+        key: value
+        for key, value in current.items()
+        if key not in loaded or loaded[key] != value
+    }
+    target = pathlib.Path(path)
+    if not changed and target.is_file():
+        return False
+    with sync.lock(f"{path}.lock"):
+        return persist(
+            target,
+            json.dumps(
+                (
+                    {**json.loads(target.read_bytes()), **changed}
+                    if target.is_file()
+                    else dict(current)
+                ),
+                indent=2,
+            ),
+        )
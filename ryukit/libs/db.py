@@ -2,7 +2,10 @@
 
 import contextlib
 import datetime
-from typing import Any
+import os
+import threading
+from collections.abc import Callable
+from typing import Any, cast
 
 import sqlalchemy
 import sqlalchemy.event
@@ -10,8 +13,21 @@ import sqlalchemy.orm
 
 from . import paths
 
-__all__ = ["RyujinxSave", "client", "CLIENT_CONFIGS"]
+__all__ = [
+    "RyujinxSave",
+    "RyujinxSaveFile",
+    "client",
+    "transaction",
+    "engine",
+    "migrate",
+    "CLIENT_CONFIGS",
+    "MIGRATIONS",
+    "LABEL_SEARCH",
+]
 CLIENT_CONFIGS: dict[str, Any] = {"url": f"sqlite:///{paths.DATABASE_FILE}"}
+ENGINE: dict[str, Any] = {}
+ENGINE_LOCK = threading.Lock()
+TRANSACTION = threading.local()
 
 
 class Base(sqlalchemy.orm.DeclarativeBase): ...
@@ -27,20 +43,104 @@ class RyujinxSave(Base):
         sqlalchemy.orm.mapped_column(
             type_=sqlalchemy.TIMESTAMP,
             server_default=sqlalchemy.func.current_timestamp(),
+            index=True,
         )
     )
     updated: sqlalchemy.orm.Mapped[datetime.datetime] = (
         sqlalchemy.orm.mapped_column(
             type_=sqlalchemy.TIMESTAMP,
             server_default=sqlalchemy.func.current_timestamp(),
+            index=True,
         )
     )
     last_used: sqlalchemy.orm.Mapped[datetime.datetime] = (
-        sqlalchemy.orm.mapped_column(type_=sqlalchemy.TIMESTAMP, nullable=True)
+        sqlalchemy.orm.mapped_column(
+            type_=sqlalchemy.TIMESTAMP, nullable=True, index=True
+        )
     )
     size: sqlalchemy.orm.Mapped[int] = sqlalchemy.orm.mapped_column(
         server_default="0"
     )
+    scope: sqlalchemy.orm.Mapped[list[str] | None] = (
+        sqlalchemy.orm.mapped_column(type_=sqlalchemy.JSON, nullable=True)
+    )
+
+
+class RyujinxSaveFile(Base):
+    __tablename__ = "ryujinx_save_files"
+    save_id: sqlalchemy.orm.Mapped[int] = sqlalchemy.orm.mapped_column(
+        sqlalchemy.ForeignKey(RyujinxSave.id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    root: sqlalchemy.orm.Mapped[str] = sqlalchemy.orm.mapped_column(
+        primary_key=True
+    )
+    path: sqlalchemy.orm.Mapped[str] = sqlalchemy.orm.mapped_column(
+        primary_key=True
+    )
+    size: sqlalchemy.orm.Mapped[int] = sqlalchemy.orm.mapped_column()
+    mtime_ns: sqlalchemy.orm.Mapped[int] = sqlalchemy.orm.mapped_column()
+    digest: sqlalchemy.orm.Mapped[str] = sqlalchemy.orm.mapped_column(
+        index=True
+    )
+
+
+LABEL_SEARCH = sqlalchemy.table(
+    "ryujinx_saves_fts", sqlalchemy.column("rowid"), sqlalchemy.column("label")
+)
+LABEL_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ryujinx_saves_fts USING fts5(label, content='ryujinx_saves', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS ryujinx_saves_fts_insert AFTER INSERT ON ryujinx_saves BEGIN INSERT INTO ryujinx_saves_fts (rowid, label) VALUES (new.id, new.label); END",
+    "CREATE TRIGGER IF NOT EXISTS ryujinx_saves_fts_delete AFTER DELETE ON ryujinx_saves BEGIN INSERT INTO ryujinx_saves_fts (ryujinx_saves_fts, rowid, label) VALUES ('delete', old.id, old.label); END",
+    "CREATE TRIGGER IF NOT EXISTS ryujinx_saves_fts_update AFTER UPDATE OF label ON ryujinx_saves BEGIN INSERT INTO ryujinx_saves_fts (ryujinx_saves_fts, rowid, label) VALUES ('delete', old.id, old.label); INSERT INTO ryujinx_saves_fts (rowid, label) VALUES (new.id, new.label); END",
+]
+for statement in LABEL_SEARCH_DDL:
+    sqlalchemy.event.listen(
+        RyujinxSave.__table__, "after_create", sqlalchemy.DDL(statement)
+    )
+
+
+def index_saves(connection: sqlalchemy.Connection, /):
+    """
+    Index bucket timestamps, and build the full-text search over bucket labels.
+
+    :param connection: Connection to the database, within a transaction.
+    """
+
+    for index in cast(sqlalchemy.Table, RyujinxSave.__table__).indexes:
+        index.create(connection, checkfirst=True)
+    for statement in LABEL_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(
+        "INSERT INTO ryujinx_saves_fts (ryujinx_saves_fts) VALUES ('rebuild')"
+    )
+
+
+def scope_saves(connection: sqlalchemy.Connection, /):
+    """
+    Give buckets title scopes.
+
+    :param connection: Connection to the database, within a transaction.
+    """
+
+    # Databases from before versioning were brought up to date by
+    # 'create_all', which leaves existing tables be.
+    if "scope" not in {
+        column["name"]
+        for column in sqlalchemy.inspect(connection).get_columns(
+            RyujinxSave.__tablename__
+        )
+    }:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {RyujinxSave.__tablename__} ADD COLUMN scope JSON"
+        )
+
+
+MIGRATIONS: list[Callable[[sqlalchemy.Connection], object]] = [
+    lambda connection: Base.metadata.create_all(connection),
+    index_saves,
+    scope_saves,
+]
 
 
 @sqlalchemy.event.listens_for(RyujinxSave, "before_update")
@@ -50,12 +150,105 @@ def on_ryujinx_save_update(
     target.updated = datetime.datetime.now(datetime.timezone.utc)
 
 
+def on_connect(connection: Any, record: object):
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute(f"PRAGMA cache_size = {-pow(2, 14)}")
+
+
+def migrate(connection: sqlalchemy.Connection, /):
+    """
+    Bring the database's schema up to date, as versioned by 'PRAGMA user_version'.
+
+    Empty databases are created in their latest shape, while others go through the migrations they're missing, in order. Every entry of 'MIGRATIONS' takes a database from the version at its index to the next, so new entries are only ever appended.
+
+    :param connection: Connection to the database, within a transaction.
+    """
+
+    version: int = connection.exec_driver_sql(
+        "PRAGMA user_version"
+    ).scalar_one()
+    if version >= len(MIGRATIONS):
+        return
+    if not sqlalchemy.inspect(connection).get_table_names():
+        Base.metadata.create_all(connection)
+    else:
+        for migration in MIGRATIONS[version:]:
+            migration(connection)
+    connection.exec_driver_sql(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+
+def engine():
+    """
+    Get the process-wide database engine.
+
+    It's made afresh, and the schema migrated, only when 'CLIENT_CONFIGS' change, the process is forked, or the database file disappears. Forked processes leave their parent's connections be.
+    """
+
+    with ENGINE_LOCK:
+        cached = ENGINE.get("engine")
+        if cached is not None and (
+            ENGINE["pid"] != os.getpid()
+            or ENGINE["configs"] != CLIENT_CONFIGS
+            or (
+                cached.url.database and not os.path.exists(cached.url.database)
+            )
+        ):
+            cached.dispose(close=ENGINE["pid"] == os.getpid())
+            cached = None
+        if cached is None:
+            cached = sqlalchemy.create_engine(**CLIENT_CONFIGS)
+            sqlalchemy.event.listen(cached, "connect", on_connect)
+            with cached.begin() as connection:
+                migrate(connection)
+            ENGINE.update(
+                engine=cached, pid=os.getpid(), configs=dict(CLIENT_CONFIGS)
+            )
+        return cached
+
+
 @contextlib.contextmanager
 def client():
-    """Create a session with the database."""
+    """
+    Create a session with the database.
+
+    Within 'transaction', sessions commit into savepoints of its transaction, and leave nothing behind if they fail.
+    """
 
-    engine = sqlalchemy.create_engine(**CLIENT_CONFIGS)
-    Base.metadata.create_all(engine)
-    with sqlalchemy.orm.Session(engine) as session:
+    connection = getattr(TRANSACTION, "connection", None)
+    with (
+        sqlalchemy.orm.Session(engine())
+        if connection is None or TRANSACTION.pid != os.getpid()
+        else sqlalchemy.orm.Session(
+            connection, join_transaction_mode="create_savepoint"
+        )
+    ) as session:
         yield session
         session.commit()
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Join the sessions created within into one transaction, committed once the context exits, or rolled back if it raises.
+
+    The transaction belongs to the thread, and process, that began it. Sessions created elsewhere don't join it.
+    """
+
+    with engine().connect() as connection:
+        # The driver doesn't begin transactions before savepoints, so
+        # releasing one would commit it. It's left in autocommit mode, and
+        # the transaction is begun by hand.
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("BEGIN")
+        TRANSACTION.connection, TRANSACTION.pid = connection, os.getpid()
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        else:
+            connection.exec_driver_sql("COMMIT")
+        finally:
+            vars(TRANSACTION).clear()
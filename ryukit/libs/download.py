@@ -0,0 +1,275 @@
+"""HTTP downloads."""
+
+import concurrent.futures
+import hashlib
+import math
+import os
+import pathlib
+import re
+import threading
+
+import requests
+import requests.adapters
+
+from . import paths, sync
+
+__all__ = ["fetch", "fetch_ranged", "cached", "evict", "chunk_size"]
+
+
+def chunk_size(total: int | None, /):
+    """
+    Pick a read size for a download, scaled to its length.
+
+    :param total: Length of the download, if known.
+    """
+
+    if not total:
+        return pow(2, 16)
+    return min(max(total // 256, pow(2, 16)), pow(2, 23))
+
+
+def fetch(
+    url: str,
+    dest: str | os.PathLike[str],
+    /,
+    *,
+    resume: bool = False,
+    session: requests.Session | None = None,
+    progress: sync.Advance | None = None,
+):
+    """
+    Stream a resource into a file, hashing it as it arrives.
+
+    :param url: Link to the resource.
+    :param dest: Path to the file.
+    :param resume: Set as true to continue from the end of an existing file through a range request. Servers that don't honour the range restart the file, while an unsatisfiable range leaves it as is.
+    :param session: Session to download through.
+    :param progress: Called with the size of every chunk written, including chunks already held when resuming, and with the resource's length once known. See 'sync.mirror'.
+    :raises requests.ConnectionError: If the resource couldn't be fetched.
+    :returns: The resource's SHA-256 digest.
+    """
+
+    hasher = hashlib.sha256()
+    offset = os.path.getsize(dest) if resume and os.path.exists(dest) else 0
+    with (session.get if session else requests.get)(
+        url,
+        stream=True,
+        timeout=30,
+        headers={"Range": f"bytes={offset}-"} if offset else None,
+    ) as response:
+        if response.status_code not in ([200, 206, 416] if offset else [200]):
+            raise requests.ConnectionError(
+                f"Unexpected status '{response.status_code}'."
+            )
+        if response.status_code == 200:
+            offset = 0
+        length = int(response.headers.get("content-length", 0))
+        if progress and response.status_code != 416:
+            progress(0, offset + length)
+        with open(dest, "r+b" if offset else "wb") as file:
+            while offset and (chunk := file.read(pow(2, 20))):
+                hasher.update(chunk)
+                if progress:
+                    progress(len(chunk), 0)
+            if response.status_code == 416:
+                return hasher.hexdigest()
+            file.truncate(offset)
+            for chunk in response.iter_content(chunk_size(offset + length)):
+                hasher.update(chunk)
+                file.write(chunk)
+                if progress:
+                    progress(len(chunk), 0)
+    return hasher.hexdigest()
+
+
+def fetch_ranged(
+    url: str,
+    dest: str | os.PathLike[str],
+    /,
+    *,
+    connections: int = 4,
+    progress: sync.Advance | None = None,
+):
+    """
+    Download a resource over several connections at once, each fetching a range of it into its place in a preallocated file.
+
+    Falls back to 'fetch' when the server doesn't serve ranges. An interrupted download is cut back to the bytes fetched contiguously from its start, for 'fetch' to resume.
+
+    :param url: Link to the resource.
+    :param dest: Path to the file.
+    :param connections: How many ranges are fetched at once.
+    :param progress: Called with the size of every chunk written, from any connection, and with the resource's length once known. See 'sync.mirror'.
+    :raises requests.ConnectionError: If the resource couldn't be fetched.
+    :returns: The resource's SHA-256 digest.
+    """
+
+    def connect():
+        if not hasattr(local, "session"):
+            session = requests.Session()
+            session.mount(
+                "http://", requests.adapters.HTTPAdapter(pool_maxsize=1)
+            )
+            session.mount(
+                "https://", requests.adapters.HTTPAdapter(pool_maxsize=1)
+            )
+            local.session = session
+            sessions.append(session)
+        return local.session
+
+    def retrieve(start: int):
+        end = min(start + span, total) - 1
+        with (
+            connect().get(
+                url,
+                stream=True,
+                timeout=30,
+                headers={"Range": f"bytes={start}-{end}"},
+            ) as response,
+            open(dest, "r+b") as file,
+        ):
+            if response.status_code != 206:
+                raise requests.ConnectionError(
+                    f"Unexpected status '{response.status_code}'."
+                )
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size(end - start + 1)):
+                file.write(chunk)
+                fetched[start] += len(chunk)
+                if progress:
+                    progress(len(chunk), 0)
+            if fetched[start] != end - start + 1:
+                raise requests.ConnectionError("Range was cut short.")
+
+    with requests.get(
+        url, stream=True, timeout=30, headers={"Range": "bytes=0-0"}
+    ) as response:
+        match = re.fullmatch(
+            r"bytes 0-0/(\d+)", response.headers.get("content-range", "")
+        )
+    if response.status_code != 206 or match is None or connections < 2:
+        return fetch(url, dest, progress=progress)
+    total = int(match[1])
+    if progress:
+        progress(0, total)
+    span = max(math.ceil(total / connections), pow(2, 20))
+    local = threading.local()
+    sessions: list[requests.Session] = []
+    fetched = {start: 0 for start in range(0, total, span)}
+    with open(dest, "wb") as file:
+        file.truncate(total)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(connections) as pool:
+            for _ in pool.map(retrieve, fetched):
+                pass
+    except BaseException:
+        kept = 0
+        for start, count in fetched.items():
+            kept += count
+            if count < min(span, total - start):
+                break
+        with open(dest, "r+b") as file:
+            file.truncate(kept)
+        raise
+    finally:
+        for session in sessions:
+            session.close()
+    return sync.digest(dest)
+
+
+def cached(
+    url: str,
+    /,
+    *,
+    sha256: str,
+    capacity: int | None = None,
+    attempts: int = 3,
+    connections: int = 1,
+    progress: sync.Advance | None = None,
+):
+    """
+    Get a resource through the download cache, fetching it only when it isn't already cached.
+
+    New downloads are fetched over 'connections' connections. Interrupted downloads are resumed over one connection, by later attempts and by later calls.
+
+    :param url: Link to the resource.
+    :param sha256: The resource's expected SHA-256 digest, which keys it in the cache.
+    :param capacity: Bytes the cache may hold after the resource is added. See 'evict'.
+    :param attempts: How many times a dropped connection is resumed before giving up.
+    :param connections: How many connections new downloads are fetched over. See 'fetch_ranged'.
+    :param progress: Called as the resource is fetched. See 'fetch'.
+    :raises requests.ConnectionError: If the resource couldn't be fetched.
+    :raises ValueError: If the fetched content doesn't match 'sha256'.
+    :returns: Path to the cached resource.
+    """
+
+    target = pathlib.Path(paths.DOWNLOAD_CACHE_DIR, sha256)
+    if target.exists():
+        os.utime(target)
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix(".part")
+    for attempt in range(attempts):
+        try:
+            if attempt == 0 and connections > 1 and not partial.exists():
+                digest = fetch_ranged(
+                    url, partial, connections=connections, progress=progress
+                )
+            else:
+                digest = fetch(url, partial, resume=True, progress=progress)
+            break
+        except (
+            requests.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        ) as e:
+            if attempt == attempts - 1:
+                raise requests.ConnectionError(e) from e
+    else:
+        raise requests.ConnectionError("No attempts were made.")
+    if digest != sha256:
+        partial.unlink()
+        raise ValueError("Content doesn't match its digest.")
+    os.replace(partial, target)
+    if capacity is not None:
+        evict(capacity, keep=target)
+    return target
+
+
+def evict(capacity: int, /, *, keep: pathlib.Path | None = None):
+    """
+    Delete the least recently used downloads until the cache fits a capacity.
+
+    Partial downloads are neither counted nor deleted.
+
+    :param capacity: Bytes the cache may hold.
+    :param keep: A download that's never evicted.
+    :returns: The amount of evicted downloads.
+    """
+
+    if not os.path.isdir(paths.DOWNLOAD_CACHE_DIR):
+        return 0
+    entries: list[tuple[str, os.stat_result]] = []
+    with os.scandir(paths.DOWNLOAD_CACHE_DIR) as listing:
+        for entry in listing:
+            # Partial downloads are in flight, or held for resuming.
+            if entry.name.endswith(".part") or not entry.is_file():
+                continue
+            try:
+                entries.append((entry.path, entry.stat()))
+            except FileNotFoundError:
+                pass
+    entries.sort(key=lambda entry: entry[1].st_mtime_ns)
+    kept = os.stat(keep) if keep is not None else None
+    total = sum(info.st_size for _, info in entries)
+    evicted = 0
+    for path, info in entries:
+        if total <= capacity:
+            break
+        if kept is not None and os.path.samestat(info, kept):
+            continue
+        total -= info.st_size
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        evicted += 1
+    return evicted
@@ -0,0 +1,101 @@
+"""Local socket API."""
+
+import contextlib
+import json
+import os
+import socket
+from collections.abc import Callable
+from typing import Any
+
+from . import sync
+
+__all__ = ["serve", "request", "supported"]
+
+
+def supported():
+    "Check whether the platform has Unix domain sockets."
+
+    return hasattr(socket, "AF_UNIX")
+
+
+def request(path: sync.PathLike, payload: dict[str, Any], /):
+    """
+    Send a request to the server listening on a socket, and wait for its response.
+
+    Requests and responses are JSON objects, each sent as a single line.
+
+    :param path: Path to the socket.
+    :param payload: The request.
+    :returns: The response, or nothing when no server is listening.
+    """
+
+    if not supported() or not os.path.exists(path):
+        return None
+    with socket.socket(socket.AF_UNIX) as client:
+        try:
+            client.connect(os.fspath(path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        client.sendall(f"{json.dumps(payload)}\n".encode())
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        return None
+    response: dict[str, Any] = json.loads(line)
+    return response
+
+
+def serve(
+    path: sync.PathLike,
+    handle: Callable[[dict[str, Any]], dict[str, Any]],
+    /,
+    *,
+    ready: Callable[[], object] | None = None,
+):
+    """
+    Answer requests on a socket, one at a time, until a response asks to stop.
+
+    Sockets left behind by servers that are gone are replaced.
+
+    :param path: Path to the socket. It's removed once serving stops.
+    :param handle: Maps requests to responses. A response with a true 'stop' entry ends serving once it's sent. Requests that aren't JSON, or that it raises on, are answered with an 'output' entry describing the error, and a 'code' entry of 1, and serving carries on.
+    :param ready: Called once the socket is listening.
+    :raises OSError: If the platform lacks Unix domain sockets.
+    :raises FileExistsError: If a server is already listening on the socket.
+    """
+
+    if not supported():
+        raise OSError("Unix domain sockets aren't supported.")
+    if request(path, {}) is not None:
+        raise FileExistsError(f"A server is already listening on '{path}'.")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with socket.socket(socket.AF_UNIX) as server:
+        server.bind(os.fspath(path))
+        try:
+            os.chmod(path, 0o600)
+            server.listen()
+            if ready:
+                ready()
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile("rwb") as stream:
+                    line = stream.readline()
+                    if not line:
+                        continue
+                    try:
+                        response = handle(json.loads(line))
+                    except Exception as e:
+                        response = {
+                            "output": f"Couldn't serve the request. {type(e).__name__}: {e}\n",
+                            "code": 1,
+                        }
+                    with contextlib.suppress(BrokenPipeError):
+                        stream.write(f"{json.dumps(response)}\n".encode())
+                        stream.flush()
+                if response.get("stop"):
+                    break
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
@@ -6,8 +6,14 @@ import platformdirs
 
 __all__ = [
     "CONFIG_FILE",
+    "CONFIG_STAMP_FILE",
     "DATABASE_FILE",
+    "DAEMON_SOCKET",
     "SAVE_INSTANCE_DIR",
+    "SAVE_INSTANCE_MANIFEST",
+    "SAVE_OBJECTS_DIR",
+    "SAVE_STAGING_FILE",
+    "DOWNLOAD_CACHE_DIR",
     "SAVE_INSTANCE_META",
     "SAVE_INSTANCE_SYSTEM_DATA",
     "SAVE_INSTANCE_USER_DATA",
@@ -15,10 +21,20 @@ __all__ = [
     "RYUJINX_DATA_DIR",
 ]
 CONFIG_FILE = f"{pathlib.Path.home()}/ryukitconfig.json"
+CONFIG_STAMP_FILE = (
+    f"{platformdirs.user_cache_dir("RyuKit", appauthor=False)}/configstamp"
+)
 DATABASE_FILE = (
     f"{platformdirs.user_data_dir("RyuKit", appauthor=False, roaming=True)}/db"
 )
+DAEMON_SOCKET = f"{platformdirs.user_data_dir("RyuKit", appauthor=False, roaming=True)}/daemon.sock"
 SAVE_INSTANCE_DIR = f"{platformdirs.user_data_dir("RyuKit", appauthor=False, roaming=True)}/saves/{'{id}'}"
+SAVE_INSTANCE_MANIFEST = f"{SAVE_INSTANCE_DIR}/manifest.json"
+SAVE_OBJECTS_DIR = f"{platformdirs.user_data_dir("RyuKit", appauthor=False, roaming=True)}/objects"
+SAVE_STAGING_FILE = f"{platformdirs.user_data_dir("RyuKit", appauthor=False, roaming=True)}/staging.json"
+DOWNLOAD_CACHE_DIR = (
+    f"{platformdirs.user_cache_dir("RyuKit", appauthor=False)}/downloads"
+)
 SAVE_INSTANCE_META = f"{SAVE_INSTANCE_DIR}/meta"
 SAVE_INSTANCE_SYSTEM_DATA = f"{SAVE_INSTANCE_DIR}/registered"
 SAVE_INSTANCE_USER_DATA = f"{SAVE_INSTANCE_DIR}/user"
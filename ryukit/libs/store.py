@@ -0,0 +1,299 @@
+"""Content-addressed file storage."""
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import stat
+import uuid
+from collections.abc import Iterable, Mapping
+from concurrent.futures import Executor
+from typing import TypedDict, cast
+
+from . import paths, sync
+
+__all__ = [
+    "Entry",
+    "Tree",
+    "Manifest",
+    "locate",
+    "put",
+    "ingest",
+    "materialize",
+    "subtree",
+    "graft",
+    "collect_garbage",
+    "lock",
+    "read_manifest",
+    "write_manifest",
+]
+Entry = TypedDict("Entry", {"digest": str, "size": int, "mtime_ns": int})
+Tree = TypedDict("Tree", {"files": dict[str, Entry], "dirs": list[str]})
+Manifest = dict[str, Tree]
+
+
+def locate(digest: str, /):
+    """
+    Get the path of a stored object.
+
+    :param digest: The object's content hash.
+    """
+
+    return pathlib.Path(paths.SAVE_OBJECTS_DIR, digest[:2], digest[2:])
+
+
+def put(
+    source: sync.PathLike,
+    /,
+    *,
+    consume: bool = False,
+    mode: sync.Mode = "copy",
+):
+    """
+    Store a file as an object.
+
+    :param source: Path to the file.
+    :param consume: Set as true to move the file into the store, rather than copy it.
+    :param mode: How the file is transferred when not consumed. See 'sync.transfer'.
+    :returns: The object's content hash.
+    """
+
+    pathlib.Path(paths.SAVE_OBJECTS_DIR).mkdir(parents=True, exist_ok=True)
+    temp = os.path.join(
+        paths.SAVE_OBJECTS_DIR, f"{uuid.uuid4().hex}.ryukit-part"
+    )
+    if consume:
+        digest, temp = sync.digest(source), source
+    elif mode == "copy":
+        with open(source, "rb") as reader, open(temp, "wb") as writer:
+            hasher = hashlib.sha256()
+            while chunk := reader.read(pow(2, 20)):
+                hasher.update(chunk)
+                writer.write(chunk)
+        digest = hasher.hexdigest()
+    else:
+        sync.transfer(source, temp, mode=mode)
+        digest = sync.digest(temp)
+    target = locate(digest)
+    if target.exists():
+        os.unlink(temp)
+        return digest
+    target.parent.mkdir(exist_ok=True)
+    os.chmod(temp, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(temp, target)
+    return digest
+
+
+def ingest(
+    root: sync.PathLike,
+    /,
+    *,
+    previous: Tree | None = None,
+    consume: bool = False,
+    mode: sync.Mode = "copy",
+    pool: Executor | None = None,
+    progress: sync.Advance | None = None,
+):
+    """
+    Store a directory tree's files as objects.
+
+    :param root: Root of the tree.
+    :param previous: An earlier record of the tree. Files it lists under unchanged sizes and modification times aren't stored again.
+    :param consume: Set as true to move files into the store, rather than copy them.
+    :param mode: How files are transferred when not consumed. See 'sync.transfer'.
+    :param pool: Workers to fan file storage out to.
+    :param progress: Called as files are stored. See 'sync.mirror'.
+    :returns: A record of the tree.
+    """
+
+    def record(path: str):
+        info, entry = files[path], known.get(path)
+        if not (
+            entry
+            and entry["size"] == info.st_size
+            and entry["mtime_ns"] == info.st_mtime_ns
+            and locate(entry["digest"]).exists()
+        ):
+            entry = Entry(
+                digest=put(
+                    os.path.join(root, path), consume=consume, mode=mode
+                ),
+                size=info.st_size,
+                mtime_ns=info.st_mtime_ns,
+            )
+        if progress:
+            progress(info.st_size, 0)
+        return entry
+
+    files, dirs = sync.scan(root)
+    known = previous["files"] if previous else {}
+    if progress:
+        progress(0, sum(info.st_size for info in files.values()))
+    return Tree(
+        files=dict(zip(files, (pool.map if pool else map)(record, files))),
+        dirs=sorted(dirs),
+    )
+
+
+def materialize(
+    tree: Tree | None,
+    dest: sync.PathLike,
+    /,
+    *,
+    mode: sync.Mode = "copy",
+    pool: Executor | None = None,
+    progress: sync.Advance | None = None,
+):
+    """
+    Bring a directory tree in line with a record, transferring only what differs.
+
+    :param tree: The record. When missing, 'dest' is removed.
+    :param dest: Root of the tree.
+    :param mode: How files are transferred. See 'sync.transfer'.
+    :param pool: Workers to fan file transfers out to.
+    :param progress: Called as files are settled. See 'sync.mirror'.
+    :returns: A tally of the transferred files.
+    """
+
+    if tree is None:
+        shutil.rmtree(dest, ignore_errors=True)
+        return sync.Report(files=0, bytes=0)
+    return sync.mirror(
+        {
+            path: {
+                "path": locate(entry["digest"]),
+                "size": entry["size"],
+                "mtime_ns": entry["mtime_ns"],
+                "digest": entry["digest"],
+            }
+            for path, entry in tree["files"].items()
+        },
+        tree["dirs"],
+        dest,
+        mode=mode,
+        pool=pool,
+        progress=progress,
+    )
+
+
+def subtree(tree: Tree | None, path: str, /):
+    """
+    Get the record of a directory within a recorded tree.
+
+    :param tree: Record of the tree.
+    :param path: Tree-relative path to the directory.
+    :returns: The directory's record, or None if the tree doesn't hold it.
+    """
+
+    if tree is None or path not in tree["dirs"]:
+        return None
+    prefix = f"{path}/"
+    return Tree(
+        files={
+            name.removeprefix(prefix): entry
+            for name, entry in tree["files"].items()
+            if name.startswith(prefix)
+        },
+        dirs=[
+            name.removeprefix(prefix)
+            for name in tree["dirs"]
+            if name.startswith(prefix)
+        ],
+    )
+
+
+def graft(trees: Mapping[str, Tree], /):
+    """
+    Record a tree made up of recorded directories. The reverse of 'subtree'.
+
+    :param trees: Records of the directories, keyed by their paths within the tree.
+    """
+
+    return Tree(
+        files={
+            f"{path}/{name}": entry
+            for path, tree in trees.items()
+            for name, entry in tree["files"].items()
+        },
+        dirs=sorted(
+            {
+                *trees,
+                *(
+                    f"{path}/{name}"
+                    for path, tree in trees.items()
+                    for name in tree["dirs"]
+                ),
+            }
+        ),
+    )
+
+
+def lock():
+    """
+    Lock the store against garbage collection.
+
+    Hold it from storing a tree's objects until its manifest is written, so they aren't collected in between.
+
+    :returns: A context holding the lock. See 'sync.lock'.
+    """
+
+    return sync.lock(f"{paths.SAVE_OBJECTS_DIR}.lock")
+
+
+def collect_garbage(manifests: Iterable[Manifest], /):
+    """
+    Delete objects no longer referenced, under the store's lock. Objects still being put are left be.
+
+    :param manifests: Every manifest referencing objects. They're consumed once the lock is held, so a lazy iterable reading manifest files sees every manifest written under the lock.
+    :returns: The amount of deleted objects.
+    """
+
+    if not os.path.isdir(paths.SAVE_OBJECTS_DIR):
+        return 0
+    deleted = 0
+    with lock():
+        referenced = {
+            entry["digest"]
+            for manifest in manifests
+            for tree in manifest.values()
+            for entry in tree["files"].values()
+        }
+        for path in sync.scan(paths.SAVE_OBJECTS_DIR)[0]:
+            if (
+                path.endswith(".ryukit-part")
+                or path.replace("/", "") in referenced
+            ):
+                continue
+            target = os.path.join(paths.SAVE_OBJECTS_DIR, path)
+            os.chmod(target, stat.S_IWRITE | stat.S_IREAD)
+            os.unlink(target)
+            deleted += 1
+    return deleted
+
+
+def read_manifest(path: sync.PathLike, /):
+    """
+    Read a manifest file.
+
+    :param path: Path to the file.
+    :returns: The manifest, or None if the file doesn't exist.
+    """
+
+    if not os.path.exists(path):
+        return None
+    return cast(Manifest, json.loads(pathlib.Path(path).read_bytes()))
+
+
+def write_manifest(path: sync.PathLike, manifest: Manifest, /):
+    """
+    Atomically write a manifest file.
+
+    :param path: Path to the file.
+    :param manifest: The manifest.
+    """
+
+    temp = pathlib.Path(f"{path}.ryukit-part")
+    temp.parent.mkdir(parents=True, exist_ok=True)
+    temp.write_text(json.dumps(manifest))
+    os.replace(temp, path)
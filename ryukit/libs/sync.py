@@ -0,0 +1,270 @@
+"""File-tree synchronization."""
+
+import contextlib
+import hashlib
+import os
+import pathlib
+import shutil
+import stat
+import sys
+import time
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import Executor
+from typing import Literal, NotRequired, TypedDict
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+__all__ = [
+    "File",
+    "Mode",
+    "Report",
+    "Advance",
+    "sync",
+    "mirror",
+    "scan",
+    "digest",
+    "transfer",
+    "lock",
+]
+PathLike = str | os.PathLike[str]
+Mode = Literal["copy", "reflink", "link"]
+FICLONE = 0x40049409
+File = TypedDict(
+    "File",
+    {
+        "path": PathLike,
+        "size": int,
+        "mtime_ns": int,
+        "digest": NotRequired[str],
+    },
+)
+Report = TypedDict("Report", {"files": int, "bytes": int})
+Advance = Callable[[int, int], object]
+
+
+def scan(root: PathLike, /):
+    """
+    Walk a directory tree, stating each entry once.
+
+    :param root: Root of the tree.
+    :returns: The tree's files, keyed by their root-relative paths, alongside the tree's subdirectories.
+    """
+
+    files: dict[str, os.stat_result] = {}
+    dirs: list[str] = []
+    pending = [""]
+    while pending:
+        prefix = pending.pop()
+        with os.scandir(os.path.join(root, prefix)) as entries:
+            for entry in entries:
+                path = f"{prefix}{entry.name}"
+                if entry.is_dir():
+                    dirs.append(path)
+                    pending.append(f"{path}/")
+                    continue
+                files[path] = entry.stat()
+    return files, dirs
+
+
+def digest(path: PathLike, /):
+    """
+    Hash a file's content.
+
+    :param path: Path to the file.
+    """
+
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def transfer(source: PathLike, dest: PathLike, /, *, mode: Mode = "copy"):
+    """
+    Give a file's content to a new path.
+
+    :param source: Path to the file.
+    :param dest: The new path. Mustn't already exist.
+    :param mode: How content is given. 'copy' copies it, 'reflink' shares it copy-on-write where the file system allows, falling back to a copy, and 'link' further hard-links read-only files before falling back.
+    """
+
+    if mode != "copy" and sys.platform == "linux":
+        with open(source, "rb") as reader, open(dest, "wb") as writer:
+            try:
+                fcntl.ioctl(writer.fileno(), FICLONE, reader.fileno())
+                return
+            except OSError:
+                pass
+        os.unlink(dest)
+    if mode == "link" and not os.stat(source).st_mode & (
+        stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    ):
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, dest)
+
+
+@contextlib.contextmanager
+def lock(path: PathLike, /, *, block: bool = True):
+    """
+    Hold an exclusive lock on a file, against other processes and threads.
+
+    Locks are released with their holder's process, even when it crashes, so none are left stale.
+
+    :param path: Path to the lock file. It's created if missing, and left in place once released.
+    :param block: Set as false to give up, rather than wait, when the lock is held elsewhere.
+    :returns: A context yielding whether the lock is held.
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as file:
+        held = False
+        while not held:
+            try:
+                if sys.platform == "win32":
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(
+                        file.fileno(),
+                        fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB),
+                    )
+                held = True
+            except OSError:
+                if not block:
+                    break
+                time.sleep(0.05)
+        try:
+            yield held
+        finally:
+            if held and sys.platform == "win32":
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def mirror(
+    files: Mapping[str, File],
+    dirs: Iterable[str],
+    dest: PathLike,
+    /,
+    *,
+    mode: Mode = "copy",
+    pool: Executor | None = None,
+    progress: Advance | None = None,
+):
+    """
+    Bring a directory tree in line with a listing, transferring only what differs.
+
+    Files are compared by size and modification time, falling back to their content hashes when only the latter disagrees. Every copy lands through a rename, so no file is ever left half-written. In 'link' mode, files are only linked to sources that already bear their modification times, so placing them never retimes files linked elsewhere.
+
+    :param files: The files the tree should hold, keyed by their tree-relative paths.
+    :param dirs: The directories the tree should hold.
+    :param dest: Root of the tree.
+    :param mode: How files are transferred. See 'transfer'.
+    :param pool: Workers to fan file comparisons and transfers out to.
+    :param progress: Called with the bytes settled and the bytes found to need settling. See 'components.Progress.advance'.
+    :returns: A tally of the transferred files.
+    """
+
+    def settle(path: str):
+        file, current = files[path], ours.get(path)
+        if (
+            current
+            # Retiming a linked file would retime every other link to it.
+            and current.st_nlink == 1
+            and current.st_size == file["size"]
+            and (file.get("digest") or digest(file["path"]))
+            == digest(root / path)
+        ):
+            os.utime(root / path, ns=(file["mtime_ns"], file["mtime_ns"]))
+            if progress:
+                progress(file["size"], 0)
+            return None
+        temp = root / f"{path}.ryukit-part"
+        temp.unlink(missing_ok=True)
+        transfer(
+            file["path"],
+            temp,
+            mode=(
+                "reflink"
+                if mode == "link"
+                and os.stat(file["path"]).st_mtime_ns != file["mtime_ns"]
+                else mode
+            ),
+        )
+        os.utime(temp, ns=(file["mtime_ns"], file["mtime_ns"]))
+        os.replace(temp, root / path)
+        if progress:
+            progress(file["size"], 0)
+        return file["size"]
+
+    root = pathlib.Path(dest)
+    root.mkdir(parents=True, exist_ok=True)
+    ours, our_dirs = scan(root)
+    dirs = set(dirs)
+    for path in ours.keys() - files.keys():
+        (root / path).unlink()
+    for path in sorted(set(our_dirs).difference(dirs), reverse=True):
+        shutil.rmtree(root / path, ignore_errors=True)
+    for path in sorted(dirs):
+        (root / path).mkdir(exist_ok=True)
+    pending = [
+        path
+        for path, file in files.items()
+        if path not in ours
+        or ours[path].st_size != file["size"]
+        or ours[path].st_mtime_ns != file["mtime_ns"]
+    ]
+    if progress:
+        progress(0, sum(files[path]["size"] for path in pending))
+    moved = [
+        size
+        for size in (pool.map if pool else map)(settle, pending)
+        if size is not None
+    ]
+    return Report(files=len(moved), bytes=sum(moved))
+
+
+def sync(
+    source: PathLike,
+    dest: PathLike,
+    /,
+    *,
+    mode: Mode = "copy",
+    pool: Executor | None = None,
+    progress: Advance | None = None,
+):
+    """
+    Mirror a directory tree onto another, transferring only what differs.
+
+    :param source: The tree to mirror. When missing, 'dest' is removed.
+    :param dest: The tree to update.
+    :param mode: How files are transferred. See 'transfer'.
+    :param pool: Workers to fan file transfers out to.
+    :param progress: Called as files are settled. See 'mirror'.
+    :returns: A tally of the transferred files.
+    """
+
+    if not os.path.isdir(source):
+        shutil.rmtree(dest, ignore_errors=True)
+        return Report(files=0, bytes=0)
+    files, dirs = scan(source)
+    return mirror(
+        {
+            path: {
+                "path": os.path.join(source, path),
+                "size": info.st_size,
+                "mtime_ns": info.st_mtime_ns,
+            }
+            for path, info in files.items()
+        },
+        dirs,
+        dest,
+        mode=mode,
+        pool=pool,
+        progress=progress,
+    )
@@ -0,0 +1,246 @@
+"""Directory-tree change detection."""
+
+import contextlib
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+from collections.abc import Iterable
+from typing import TypedDict
+
+from . import sync
+
+__all__ = ["Tally", "watch"]
+Tally = TypedDict("Tally", {"bytes": int, "churn": int})
+EVENT = struct.Struct("iIII")
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+
+def inotify():
+    """
+    Get libc's inotify functions.
+
+    :raises OSError: If inotify is unavailable.
+    """
+
+    if sys.platform != "linux":
+        raise OSError("inotify is only available on Linux.")
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        init, add_watch, rm_watch = (
+            libc.inotify_init1,
+            libc.inotify_add_watch,
+            libc.inotify_rm_watch,
+        )
+    except AttributeError as e:
+        raise OSError("libc lacks inotify.") from e
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return init, add_watch, rm_watch
+
+
+@contextlib.contextmanager
+def watch(roots: Iterable[str], /, *, events: bool = True):
+    """
+    Keep a running total of the bytes held under directory trees, and of the bytes changed within them.
+
+    Trees are watched through inotify where available, so only paths named by change events are stated again. Otherwise, or once inotify fails mid-watch, e.g. for want of watches, trees are walked on every poll, and files whose sizes or modification times differ from the last poll's count as changed.
+
+    :param roots: Roots of the trees. They needn't exist yet.
+    :param events: Set as false to always poll, rather than watch.
+    :returns: A function that applies pending changes and returns the current tally.
+    """
+
+    def add(path: str):
+        wd = add_watch(fd, os.fsencode(path), MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                # Gone before it could be watched.
+                return
+            raise OSError(error, os.strerror(error))
+        watched[path], paths[wd] = wd, path
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        add(entry.path)
+                        continue
+                    settle(entry.path)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+
+    def drop(path: str):
+        nonlocal total, churn
+        for dir in [
+            dir for dir in watched if dir == path or dir.startswith(f"{path}/")
+        ]:
+            paths.pop(watched[dir], None)
+            rm_watch(fd, watched.pop(dir))
+        for file in [file for file in sizes if file.startswith(f"{path}/")]:
+            size = sizes.pop(file)
+            total, churn = total - size, churn + size
+
+    def settle(path: str):
+        nonlocal total, churn
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            size = None
+        previous = sizes.pop(path, 0)
+        total -= previous
+        churn += previous if size is None else size
+        if size is not None:
+            sizes[path] = size
+            total += size
+
+    def rescan():
+        nonlocal total
+        for root in [*watched]:
+            drop(root)
+        sizes.clear()
+        total = 0
+        for root in roots:
+            if os.path.isdir(root):
+                add(root)
+
+    def survey():
+        nonlocal total, churn
+        current: dict[str, tuple[int, int]] = {}
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            try:
+                files, _ = sync.scan(root)
+            except (FileNotFoundError, NotADirectoryError):
+                # Changed mid-walk. The next poll picks the change up.
+                current.update(
+                    (path, stamp)
+                    for path, stamp in stamps.items()
+                    if path.startswith(f"{root}/")
+                )
+                continue
+            current.update(
+                (f"{root}/{path}", (info.st_size, info.st_mtime_ns))
+                for path, info in files.items()
+            )
+        for path in stamps.keys() | current.keys():
+            if stamps.get(path) != current.get(path):
+                churn += (current.get(path) or stamps[path])[0]
+        stamps.clear()
+        stamps.update(current)
+        total = sum(size for size, _ in current.values())
+
+    def listen(fd: int):
+        while True:
+            try:
+                buffer = os.read(fd, pow(2, 16))
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = EVENT.unpack_from(buffer, offset)
+                name = buffer[
+                    offset + EVENT.size : offset + EVENT.size + length
+                ].rstrip(b"\0")
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan()
+                    break
+                if wd not in paths:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    drop(paths[wd])
+                    continue
+                path = os.path.join(paths[wd], os.fsdecode(name))
+                if not mask & IN_ISDIR:
+                    changed.add(path)
+                elif mask & (IN_MOVED_FROM | IN_DELETE):
+                    drop(path)
+                elif mask & (IN_MOVED_TO | IN_CREATE):
+                    add(path)
+        for path in changed:
+            settle(path)
+        changed.clear()
+        for root in roots:
+            if root not in watched and os.path.isdir(root):
+                add(root)
+
+    def poll():
+        nonlocal fd, churn
+        if fd is None:
+            survey()
+            return Tally(bytes=total, churn=churn)
+        try:
+            listen(fd)
+        except OSError:
+            # Out of watches, say. Trees are polled from here on, as they
+            # are where inotify is unavailable.
+            for path in changed:
+                settle(path)
+            changed.clear()
+            os.close(fd)
+            fd = None
+            known, churned = dict(sizes), churn
+            survey()
+            churn = churned
+            for path in known.keys() | stamps.keys():
+                size = stamps[path][0] if path in stamps else None
+                if known.get(path) != size:
+                    churn += known[path] if size is None else size
+        return Tally(bytes=total, churn=churn)
+
+    roots = [os.path.abspath(root) for root in roots]
+    sizes: dict[str, int] = {}
+    stamps: dict[str, tuple[int, int]] = {}
+    watched: dict[str, int] = {}
+    paths: dict[int, str] = {}
+    changed: set[str] = set()
+    total = churn = 0
+    fd: int | None = None
+    try:
+        if events:
+            try:
+                init, add_watch, rm_watch = inotify()
+                descriptor: int = init(os.O_NONBLOCK | os.O_CLOEXEC)
+                if descriptor < 0:
+                    raise OSError(ctypes.get_errno(), "inotify_init1 failed.")
+                fd = descriptor
+                rescan()
+                churn = 0
+            except OSError:
+                if fd is not None:
+                    os.close(fd)
+                fd = None
+        if fd is None:
+            survey()
+            churn = 0
+        yield poll
+    finally:
+        if fd is not None:
+            os.close(fd)
@@ -5,13 +5,13 @@ import datetime
 import functools
 import io
 import json
-import pathlib
+import os
 import sys
 from collections.abc import Callable
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
-import sqlalchemy
-import sqlalchemy.orm
+if TYPE_CHECKING:
+    import sqlalchemy.orm
 
 __all__ = [
     "megabytes",
@@ -21,6 +21,7 @@ __all__ = [
     "use",
     "capture_out",
 ]
+LISTINGS: dict[str, tuple[int, list[str], list[str]]] = {}
 
 
 @contextlib.contextmanager
@@ -45,7 +46,9 @@ def megabytes(byte_total: int, /):
     return byte_total / pow(2, 20)
 
 
-def model_to_dict(model: sqlalchemy.orm.DeclarativeBase, /) -> dict[str, Any]:
+def model_to_dict(
+    model: "sqlalchemy.orm.DeclarativeBase", /
+) -> dict[str, Any]:
     """
     Convert a model to a dict.
 
@@ -62,17 +65,46 @@ def size(obj: Any, /, *, sizing: Literal["dir"]):
     """
     Get the size of an object.
 
+    Directory listings are cached against their modification times, so unchanged subtrees aren't listed again. Files are still stated on every call, since rewriting a file in place leaves its directory's modification time untouched.
+
     :param obj: The object to be sized.
     :param sizing: The type of sizing to be done.
     """
 
     match sizing:
         case "dir":
-            return sum(
-                path.stat().st_size
-                for path in pathlib.Path(obj).glob("**")
-                if not path.is_dir()
-            )
+            total = 0
+            pending: list[str] = [os.fspath(obj)]
+            while pending:
+                path = pending.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = LISTINGS.get(path)
+                if cached and cached[0] == mtime_ns:
+                    pending.extend(cached[2])
+                    for file in cached[1]:
+                        try:
+                            total += os.stat(file).st_size
+                        except OSError:
+                            pass
+                    continue
+                files: list[str] = []
+                dirs: list[str] = []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            if entry.is_dir():
+                                dirs.append(entry.path)
+                                continue
+                            files.append(entry.path)
+                            total += entry.stat().st_size
+                except OSError:
+                    continue
+                LISTINGS[path] = (mtime_ns, files, dirs)
+                pending.extend(dirs)
+            return total
 
 
 def use[R](func: Callable[..., R]):
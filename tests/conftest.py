@@ -16,7 +16,14 @@ __all__ = ["seed"]
 def seed():
     with tempfile.TemporaryDirectory() as dir:
         paths.CONFIG_FILE = f"{dir}/ryukitconfig.json"
+        paths.CONFIG_STAMP_FILE = f"{dir}/configstamp"
         paths.SAVE_INSTANCE_DIR = f"{dir}/saves/{'{id}'}"
+        paths.SAVE_INSTANCE_MANIFEST = (
+            f"{paths.SAVE_INSTANCE_DIR}/manifest.json"
+        )
+        paths.SAVE_OBJECTS_DIR = f"{dir}/objects"
+        paths.SAVE_STAGING_FILE = f"{dir}/staging.json"
+        paths.DOWNLOAD_CACHE_DIR = f"{dir}/downloads"
         paths.SAVE_INSTANCE_META = f"{paths.SAVE_INSTANCE_DIR}/meta"
         paths.SAVE_INSTANCE_SYSTEM_DATA = (
             f"{paths.SAVE_INSTANCE_DIR}/registered"
@@ -25,6 +32,7 @@ def seed():
         paths.RYUJINX_DIST_DIR = f"{dir}/ryujinx/dist"
         paths.RYUJINX_DATA_DIR = f"{dir}/ryujinx/data"
         paths.DATABASE_FILE = f"{dir}/db"
+        paths.DAEMON_SOCKET = f"{dir}/daemon.sock"
         db.CLIENT_CONFIGS.update(
             {"url": f"sqlite:///{paths.DATABASE_FILE}", "echo": True}
         )
@@ -1,26 +1,40 @@
 import filecmp
+import glob
+import hashlib
 import importlib
 import importlib.resources
+import json
 import multiprocessing
 import os
 import pathlib
 import random
 import shutil
 import signal
+import socket
+import subprocess
+import sys
 import tarfile
 import tempfile
+import threading
 import time
-from typing import Literal, cast
+import zipfile
+from typing import Any, Literal, cast
 
 import setproctitle
 import sqlalchemy
 import typer
-from pytest import mark
+from pytest import mark, raises
 
 from ryukit import utils as ryutils
-from ryukit.app.__context__ import USER_CONFIGS
+from ryukit.app.__context__ import INTERNAL_CONFIGS, USER_CONFIGS
+from ryukit.app.batch import batch
+from ryukit.app.daemon import daemon
 from ryukit.app.install_ryujinx import install_ryujinx
-from ryukit.app.save.__context__ import channel_save_bucket
+from ryukit.app.save.__context__ import (
+    Compression,
+    channel_save_bucket,
+    record_save_bucket,
+)
 from ryukit.app.save.apply import apply
 from ryukit.app.save.create import create
 from ryukit.app.save.drop import drop
@@ -29,23 +43,211 @@ from ryukit.app.save.ls import ls
 from ryukit.app.save.pull import pull
 from ryukit.app.save.relabel import relabel
 from ryukit.app.save.restore import restore
+from ryukit.app.save.stage import stage
 from ryukit.app.track import track
-from ryukit.libs import db, paths
+from ryukit.libs import db, ipc, paths
 
 from . import utils
 
 __all__ = [
+    "test_startup",
+    "test_start_configs",
+    "test_daemon",
+    "test_batch",
     "test_install_ryujinx",
+    "test_install_ryujinx_local",
     "test_save_create",
     "test_save_drop",
     "test_save_ls",
+    "test_save_ls_search",
     "test_save_apply",
+    "test_save_pull_title",
     "test_save_dump",
+    "test_save_dump_since",
     "test_save_restore",
+    "test_save_restore_only",
+    "test_save_restore_unsafe",
     "test_track",
+    "test_track_checkpoint",
 ]
 
 
+@mark.parametrize(
+    "args, unloaded",
+    [
+        (["--help"], ["sqlalchemy", "jsonschema", "requests", "psutil"]),
+        (["save", "--help"], ["sqlalchemy", "requests", "psutil", "tarfile"]),
+        (["save", "relabel", "--help"], ["requests", "psutil"]),
+        (["install_ryujinx", "--help"], ["sqlalchemy", "psutil", "tarfile"]),
+    ],
+)
+def test_startup(args: list[str], unloaded: list[str]):
+    with tempfile.TemporaryDirectory() as dir:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, ryukit\n"
+                f"sys.argv = ['ryukit', *{args!r}]\n"
+                "try:\n"
+                "    ryukit.start()\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "print(*sys.modules, sep='\\n', file=sys.stderr)",
+            ],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "HOME": dir, "XDG_DATA_HOME": dir},
+        )
+        elapsed = time.perf_counter() - start
+    assert process.returncode == 0, process.stderr
+    assert not set(unloaded).intersection(
+        process.stderr.splitlines()
+    ), "Startup imported modules it doesn't use."
+    assert elapsed < 5, f"Startup took {elapsed:.2f}s."
+
+
+def test_start_configs():
+    def run(config: str, value: object, args: list[str]):
+        return subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "import sys, ryukit\n"
+                "from ryukit.app.__context__ import USER_CONFIGS\n"
+                f"USER_CONFIGS[{config!r}] = {value!r}\n"
+                f"sys.argv = ['ryukit', *{args!r}]\n"
+                "ryukit.start()",
+            ],
+            stdout=subprocess.DEVNULL,
+            env={**os.environ, "HOME": dir, "XDG_DATA_HOME": dir},
+        )
+
+    with tempfile.TemporaryDirectory() as dir:
+        socket = f"{dir}/RyuKit/daemon.sock"
+        first = run("downloadCacheSize", 1, ["daemon"])
+        try:
+            while not os.path.exists(socket):
+                assert first.poll() is None, "Daemon didn't start."
+                time.sleep(0.01)
+            assert (
+                run("ryujinxInstallURL", "http://edited", ["--help"]).wait(10)
+                == 0
+            )
+        finally:
+            ipc.request(socket, {"stop": True})
+            first.wait(10)
+        saved = json.loads(pathlib.Path(dir, "ryukitconfig.json").read_bytes())
+    assert (
+        saved["downloadCacheSize"] == 1
+        and saved["ryujinxInstallURL"] == "http://edited"
+    ), "A process's changes were lost to another's."
+
+
+def test_daemon(seed: object):
+    db.CLIENT_CONFIGS.update({"echo": False})
+    with ryutils.capture_out() as register:
+        ls(False, None)
+    server = threading.Thread(target=daemon)
+    server.start()
+    while not os.path.exists(paths.DAEMON_SOCKET):
+        time.sleep(0.01)
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(paths.DAEMON_SOCKET)
+            client.sendall(b"{\n")
+            with client.makefile("rb") as reader:
+                assert (
+                    json.loads(reader.readline())["code"] == 1
+                ), "Malformed request was served."
+        for request in [
+            {"argv": ["save", "ls"]},
+            {
+                "argv": ["save", "ls"],
+                "cwd": f"{os.getcwd()}/nope",
+                "columns": 80,
+            },
+        ]:
+            response = ipc.request(paths.DAEMON_SOCKET, request)
+            assert (
+                response is not None and response["code"] == 1
+            ), "Faulty request was served."
+        pathlib.Path(paths.CONFIG_FILE).write_text("{")
+        response = ipc.request(
+            paths.DAEMON_SOCKET,
+            {"argv": ["save", "ls"], "cwd": os.getcwd(), "columns": 80},
+        )
+        assert (
+            response is not None and "Malformed" in response["output"]
+        ), "Malformed configuration was loaded."
+        pathlib.Path(paths.CONFIG_FILE).unlink()
+        for argv, code, output in [
+            (["save", "ls"], 0, register.pop()),
+            (["save", "relabel", "99", "--as", "x"], 1, "No bucket"),
+            (["save", "nope"], 2, "No such command"),
+        ]:
+            response = ipc.request(
+                paths.DAEMON_SOCKET,
+                {"argv": argv, "cwd": os.getcwd(), "columns": 80},
+            )
+            assert response is not None, "Daemon didn't respond."
+            assert response["code"] == code, "Incorrect exit code."
+            assert output in response["output"], "Incorrect output."
+    finally:
+        daemon(stop=True)
+        server.join()
+        db.CLIENT_CONFIGS.update({"echo": True})
+    assert not os.path.exists(paths.DAEMON_SOCKET), "Socket was left behind."
+    assert (
+        ipc.request(paths.DAEMON_SOCKET, {}) is None
+    ), "Stopped daemon responded."
+
+
+@mark.parametrize(
+    "transaction, keep_going, labels",
+    [
+        (False, False, ["renamed", "first"]),
+        (True, False, []),
+        (False, True, ["renamed", "first", "last"]),
+        (True, True, ["renamed", "first", "last"]),
+    ],
+)
+def test_batch(
+    seed: object, transaction: bool, keep_going: bool, labels: list[str]
+):
+    with db.client() as client:
+        initials = list(
+            client.scalars(
+                sqlalchemy.select(db.RyujinxSave.label).order_by(
+                    db.RyujinxSave.id
+                )
+            )
+        )
+    with tempfile.TemporaryFile("w+") as script:
+        script.write(
+            "# Provisioning.\n"
+            "save create first\n"
+            '["save", "relabel", "1", "--as", "renamed"]\n'
+            "\n"
+            "ryukit save relabel 99 --as missing\n"
+            "save create 'last'\n"
+        )
+        script.seek(0)
+        with raises(typer.Exit):
+            batch(
+                cast(Any, script),
+                transaction=transaction,
+                keep_going=keep_going,
+            )
+    with db.client() as client:
+        assert set(
+            client.scalars(sqlalchemy.select(db.RyujinxSave.label))
+        ) == set(
+            initials[1:] + (labels or initials[:1])
+        ), "Incorrect buckets after the batch."
+
+
 # NOTE: Coverage doesn't work, because of child-process usage.
 @mark.parametrize(
     "use, stop",
@@ -68,7 +270,9 @@ def test_track(seed: object, use: int | None, stop: Literal["app", "track"]):
         "app": multiprocessing.Process(target=null_process),
         "track": multiprocessing.Process(target=track, args=[1]),
     }
-    any(processes[process].start() for process in ["app", "track"])
+    processes["app"].start()
+    utils.await_process("Ryujinx.exe")
+    processes["track"].start()
     time.sleep(random.random())
     (
         processes[stop].terminate()
@@ -84,23 +288,173 @@ def test_track(seed: object, use: int | None, stop: Literal["app", "track"]):
     any(process.kill() for process in processes.values() if process.is_alive())
 
 
-def test_save_dump(seed: object):
+def test_track_checkpoint(seed: object):
+    def null_process():
+        setproctitle.setproctitle("Ryujinx.exe")
+        while True:
+            pass
+
+    USER_CONFIGS["trackCheckpointInterval"] = 1
+    INTERNAL_CONFIGS["track"]["checkpoint_quiet"] = 0.5
+    processes = [
+        multiprocessing.Process(target=null_process),
+        multiprocessing.Process(target=track, args=[1]),
+    ]
+    try:
+        processes[0].start()
+        utils.await_process("Ryujinx.exe")
+        processes[1].start()
+        time.sleep(1)
+        channel_save_bucket(2, upstream=True)
+        time.sleep(4)
+        assert processes[1].is_alive(), "Tracking stopped early."
+        with db.client() as client:
+            assert (
+                cast(db.RyujinxSave, client.get(db.RyujinxSave, 1)).size
+                == cast(db.RyujinxSave, client.get(db.RyujinxSave, 2)).size
+            ), "Session was not checkpointed."
+    finally:
+        any(process.kill() for process in processes)
+        any(process.join() for process in processes)
+        USER_CONFIGS["trackCheckpointInterval"] = 300
+        INTERNAL_CONFIGS["track"]["checkpoint_quiet"] = 2
+
+
+@mark.parametrize("compression", [None, "gz", "xz"])
+def test_save_dump(seed: object, compression: Compression | None):
     with tempfile.TemporaryDirectory() as dir:
         dump_file = pathlib.Path(dir) / "dump"
-        dump(dump_file)
-        for part, path in [
-            ("test", dump_file),
-            ("truth", str(importlib.resources.files("tests") / "saves")),
-        ]:
-            with tarfile.open(path) as tar:
-                tar.extractall(f"{dir}/{part}")
-        comparison = filecmp.dircmp(f"{dir}/test", f"{dir}/truth")
-        assert (
-            []
-            == comparison.diff_files
-            == comparison.left_only
-            == comparison.right_only
-        ), "Invalid dump content."
+        dump(dump_file, compression=compression)
+        with tarfile.open(dump_file) as tar:
+            for member in tar.getmembers():
+                if member.name == "index":
+                    continue
+                with tarfile.open(
+                    fileobj=tar.extractfile(member),
+                    mode=cast(Any, f"r:{compression or ""}"),
+                ):
+                    pass
+        with db.client() as client:
+            truth = list(
+                map(
+                    ryutils.model_to_dict,
+                    client.scalars(sqlalchemy.select(db.RyujinxSave)),
+                )
+            )
+        shutil.move(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/truth"
+        )
+        pathlib.Path(paths.DATABASE_FILE).unlink()
+        restore([dump_file])
+        comparison = filecmp.dircmp(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/truth"
+        )
+        with db.client() as client:
+            assert list(
+                map(
+                    ryutils.model_to_dict,
+                    client.scalars(sqlalchemy.select(db.RyujinxSave)),
+                )
+            ) == truth and (
+                []
+                == comparison.diff_files
+                == comparison.left_only
+                == comparison.right_only
+            ), "Dump didn't restore to its buckets."
+
+
+def test_save_dump_since(seed: object):
+    with tempfile.TemporaryDirectory() as dir:
+        base, increment = pathlib.Path(dir) / "base", pathlib.Path(dir) / "inc"
+        dump(base)
+        create("CREATED")
+        relabel(2, as_="RELABELLED")
+        drop([5])
+        dump(increment, since=base)
+        with db.client() as client:
+            created = client.scalar(sqlalchemy.func.max(db.RyujinxSave.id))
+        with tarfile.open(increment) as tar:
+            assert sorted(tar.getnames()) == sorted(
+                ["index", "save2.tar", f"save{created}.tar"]
+            ), "Increment doesn't hold exactly the updated buckets."
+        with db.client() as client:
+            truth = list(
+                map(
+                    ryutils.model_to_dict,
+                    client.scalars(sqlalchemy.select(db.RyujinxSave)),
+                )
+            )
+        shutil.move(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/truth"
+        )
+        pathlib.Path(paths.DATABASE_FILE).unlink()
+        try:
+            restore([increment])
+        except typer.Exit:
+            pass
+        else:
+            raise AssertionError("Restored an increment without its base.")
+        restore([base, increment])
+        comparison = filecmp.dircmp(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/truth"
+        )
+        with db.client() as client:
+            assert list(
+                map(
+                    ryutils.model_to_dict,
+                    client.scalars(sqlalchemy.select(db.RyujinxSave)),
+                )
+            ) == truth and (
+                []
+                == comparison.diff_files
+                == comparison.left_only
+                == comparison.right_only
+            ), "Dump chain didn't restore to its buckets."
+
+
+def test_save_restore_only(seed: object):
+    with tempfile.TemporaryDirectory() as dir:
+        dump_file = pathlib.Path(dir) / "dump"
+        dump(dump_file, compression="gz")
+        with tarfile.open(dump_file) as tar:
+            assert (
+                cast(tarfile.TarInfo, tar.next()).name == "index"
+            ), "Index doesn't lead the dump."
+        with ryutils.capture_out() as register:
+            restore([dump_file], only=[2, 5], list_=True)
+        assert [
+            line.split()[0]
+            for line in register.pop().splitlines()
+            if line.split()[:1] and line.split()[0].isdigit()
+        ] == ["2", "5"], "Listing doesn't match the picked buckets."
+        with db.client() as client:
+            truth = ryutils.model_to_dict(
+                cast(db.RyujinxSave, client.get(db.RyujinxSave, 2))
+            )
+        shutil.move(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/truth"
+        )
+        pathlib.Path(paths.DATABASE_FILE).unlink()
+        restore([dump_file], only=[2])
+        comparison = filecmp.dircmp(
+            paths.SAVE_INSTANCE_DIR.format(id=1),
+            paths.SAVE_INSTANCE_DIR.format(id=2).replace(
+                str(pathlib.Path(paths.SAVE_INSTANCE_DIR).parent),
+                f"{dir}/truth",
+            ),
+        )
+        with db.client() as client:
+            assert list(
+                map(
+                    ryutils.model_to_dict,
+                    client.scalars(sqlalchemy.select(db.RyujinxSave)),
+                )
+            ) == [{**truth, "id": 1}] and (
+                []
+                == comparison.diff_files
+                == comparison.left_only
+                == comparison.right_only
+            ), "Picked bucket wasn't restored alone."
 
 
 def test_save_restore(seed: object):
@@ -111,7 +465,11 @@ def test_save_restore(seed: object):
         with db.client() as client1:
             pathlib.Path(paths.DATABASE_FILE).unlink()
             restore(
-                pathlib.Path(str(importlib.resources.files("tests") / "saves"))
+                [
+                    pathlib.Path(
+                        str(importlib.resources.files("tests") / "saves")
+                    )
+                ]
             )
             shutil.move(
                 pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, f"{dir}/test"
@@ -136,6 +494,33 @@ def test_save_restore(seed: object):
                 ), "Failed to restore content."
 
 
+def test_save_restore_unsafe(seed: object):
+    with tempfile.TemporaryDirectory() as dir:
+        dump_file = pathlib.Path(dir) / "dump"
+        with (
+            tarfile.open(
+                str(importlib.resources.files("tests") / "saves")
+            ) as source,
+            tarfile.open(dump_file, "w") as tar,
+        ):
+            for member in source:
+                tar.addfile(member, source.extractfile(member))
+            tar.addfile(tarfile.TarInfo("save2/../../../escaped"))
+        shutil.rmtree(pathlib.Path(paths.SAVE_INSTANCE_DIR).parent)
+        pathlib.Path(paths.DATABASE_FILE).unlink()
+        with raises(typer.Exit):
+            restore([dump_file])
+        with db.client() as client:
+            assert not list(
+                client.scalars(sqlalchemy.select(db.RyujinxSave))
+            ) and not glob.glob(
+                glob.escape(paths.SAVE_INSTANCE_DIR).format(id="*")
+            ), "A failed restore left buckets behind."
+        assert not os.path.exists(
+            os.path.join(paths.SAVE_INSTANCE_DIR.format(id=2), "../../escaped")
+        ), "A member was extracted outside its bucket."
+
+
 def test_relabel(seed: object):
     with db.client() as client:
         save = cast(db.RyujinxSave, client.get(db.RyujinxSave, 1))
@@ -169,6 +554,89 @@ def test_save_pull(seed: object, push: int | None):
             cast(db.RyujinxSave, client.get(db.RyujinxSave, 1)).size
             == expected
         )
+        assert (
+            client.scalar(
+                sqlalchemy.select(
+                    sqlalchemy.func.coalesce(
+                        sqlalchemy.func.sum(db.RyujinxSaveFile.size), 0
+                    )
+                ).where(db.RyujinxSaveFile.save_id == 1)
+            )
+            == expected
+        ), "File records disagree with the bucket's size."
+
+
+@mark.parametrize(
+    "storage, apply_mode",
+    [("plain", "sync"), ("dedup", "sync"), ("plain", "staged")],
+)
+def test_save_pull_title(seed: object, storage: str, apply_mode: str):
+    USER_CONFIGS.update({"saveStorage": storage, "saveApply": apply_mode})
+    lives = list(INTERNAL_CONFIGS["save_buckets"]["flow"].values())
+    try:
+        for live in lives:
+            for title in ["a", "b"]:
+                pathlib.Path(live, title).mkdir(parents=True, exist_ok=True)
+                pathlib.Path(live, title, "data").write_text(f"{live}/{title}")
+        pull(1, title=["a"])
+        with db.client() as client:
+            save = cast(db.RyujinxSave, client.get(db.RyujinxSave, 1))
+            assert save.scope == ["a"] and save.size == sum(
+                len(f"{live}/a") for live in lives
+            ), "Bucket holds saves beyond its titles."
+        for live in lives:
+            for title in ["a", "b"]:
+                pathlib.Path(live, title, "data").write_text("changed")
+        apply(1)
+        assert all(
+            pathlib.Path(live, "a", "data").read_text() == f"{live}/a"
+            and pathlib.Path(live, "b", "data").read_text() == "changed"
+            for live in lives
+        ), "Saves beyond the bucket's titles were applied over."
+        with raises(typer.Exit):
+            stage(1)
+        with raises(typer.Exit):
+            pull(1, title=["a"], all_titles=True)
+        pull(1, all_titles=True)
+        with db.client() as client:
+            save = cast(db.RyujinxSave, client.get(db.RyujinxSave, 1))
+            assert save.scope is None and save.size == sum(
+                len(f"{live}/a") + len("changed") for live in lives
+            ), "Bucket wasn't unscoped."
+    finally:
+        USER_CONFIGS.update({"saveStorage": "plain", "saveApply": "sync"})
+
+
+@mark.parametrize("corrupt", [False, True])
+def test_install_ryujinx_local(seed: object, corrupt: bool):
+    with tempfile.TemporaryDirectory() as dir:
+        with zipfile.ZipFile(f"{dir}/ryujinx.zip", "w") as zip:
+            zip.writestr("metadata.json", "{}")
+            for key in INTERNAL_CONFIGS["ryujinx_install"]["paths"]:
+                zip.writestr(f"{key}/{key}.bin", os.urandom(pow(2, 16)))
+        archive = pathlib.Path(f"{dir}/ryujinx.zip").read_bytes()
+    sha256 = INTERNAL_CONFIGS["ryujinx_install"]["sha256"]
+    INTERNAL_CONFIGS["ryujinx_install"]["sha256"] = hashlib.sha256(
+        archive
+    ).hexdigest()
+    try:
+        with utils.serve(
+            {"/ryujinx.zip": archive[:-1] if corrupt else archive}
+        ) as (url, _):
+            USER_CONFIGS["ryujinxInstallURL"] = f"{url}/ryujinx.zip"
+            install_ryujinx()
+        assert not corrupt, "Corrupt content was installed."
+        assert all(
+            os.path.isfile(f"{path}/{key}.bin")
+            for key, path in INTERNAL_CONFIGS["ryujinx_install"][
+                "paths"
+            ].items()
+        ), "Files were not installed."
+    except typer.Exit:
+        assert corrupt, "Valid content was rejected."
+    finally:
+        INTERNAL_CONFIGS["ryujinx_install"]["sha256"] = sha256
+        USER_CONFIGS["ryujinxInstallURL"] = None
 
 
 @utils.requires_vars("RYUKIT_INSTALL_URL")
@@ -208,6 +676,9 @@ def test_save_create(seed: object, label: str | None):
 
 @mark.parametrize("ids", [[], [1], [1, 2, 3, 4, 5]])
 def test_save_drop(seed: object, ids: list[int]):
+    with db.client() as client:
+        for id_ in range(1, 6):
+            record_save_bucket(client, id_)
     drop(ids)
     with db.client() as client:
         assert set(
@@ -215,6 +686,9 @@ def test_save_drop(seed: object, ids: list[int]):
         ) == set(
             i for i in range(1, 6) if i not in ids
         ), "Unexpected ID set remaining."
+        assert not set(
+            client.scalars(sqlalchemy.select(db.RyujinxSaveFile.save_id))
+        ).intersection(ids), "File records outlived their bucket."
 
 
 @mark.parametrize(
@@ -237,3 +711,28 @@ def test_save_ls(
         ls(wildcards, filters)
     db.CLIENT_CONFIGS.update({"echo": True})
     assert register.pop() == expected, "Incorr ect format in output."
+
+
+@mark.parametrize(
+    "filters, expected",
+    [
+        (["zelda"], [7, 6]),
+        (["zel", "tears"], [6]),
+        (["totk"], [8]),
+        (["2025-05-24", "label"], [3]),
+        (["mario"], []),
+    ],
+)
+def test_save_ls_search(seed: object, filters: list[str], expected: list[int]):
+    create("zelda tears of the kingdom")
+    create("zelda")
+    create("botw")
+    relabel(8, as_="totk")
+    drop([4])
+    with ryutils.capture_out() as register:
+        ls(False, filters)
+    assert [
+        int(line.split()[0])
+        for line in register.pop().splitlines()
+        if line.split()[:1] and line.split()[0].isdigit()
+    ] == expected, "Search didn't rank the expected buckets."
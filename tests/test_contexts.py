@@ -1,16 +1,44 @@
+import concurrent.futures
+import json
+import os
+import pathlib
+import time
+
+import sqlalchemy
 import typer
-from pytest import mark
+from pytest import MonkeyPatch, mark
 
 from ryukit import utils as ryuitls
-from ryukit.app.save.__context__ import bucket, channel_save_bucket
-from ryukit.libs import db, paths
+from ryukit.app.save.__context__ import (
+    INTERNAL_CONFIGS,
+    USER_CONFIGS,
+    bucket,
+    channel_save_bucket,
+    collect_save_garbage,
+    record_save_bucket,
+    recover_staging,
+    save_bucket_size,
+    stage_save_bucket,
+    store_save_bucket,
+)
+from ryukit.libs import db, paths, store, sync
 
-__all__ = ["test_channel_save_bucket", "test_bucket"]
+__all__ = [
+    "test_channel_save_bucket",
+    "test_bucket",
+    "test_store_save_bucket",
+    "test_record_save_bucket",
+]
 
 
 @mark.parametrize("id_, upstream", [(1, True), (2, True), (5, False)])
 def test_channel_save_bucket(seed: object, id_: int, upstream: bool):
-    channel_save_bucket(id_, upstream=upstream)
+    transfer = channel_save_bucket(id_, upstream=upstream)
+    assert transfer["bytes"] == ryuitls.size(
+        paths.RYUJINX_DATA_DIR, sizing="dir"
+    ) and (
+        channel_save_bucket(id_, upstream=upstream)["files"] == 0
+    ), "Unexpected transfer tally."
     assert ryuitls.size(
         paths.SAVE_INSTANCE_DIR.format(id=id_), sizing="dir"
     ) == ryuitls.size(
@@ -28,3 +56,136 @@ def test_bucket(seed: object, id_: int, valid: bool):
         assert valid, "Successfully fetched invalid bucket."
     except typer.Exit:
         assert not valid, "Failed to fetch a valid bucket."
+
+
+@mark.parametrize("storage", ["plain", "dedup"])
+def test_store_save_bucket(seed: object, storage: str):
+    USER_CONFIGS["saveStorage"] = storage
+    try:
+        sizes = {id_: save_bucket_size(id_) for id_ in [1, 2, 5]}
+        for id_ in sizes:
+            store_save_bucket(id_)
+        assert sizes == {
+            id_: save_bucket_size(id_) for id_ in sizes
+        }, "Bucket content changed in storage."
+        assert len(list(pathlib.Path(paths.SAVE_OBJECTS_DIR).glob("*/*"))) == (
+            storage == "dedup"
+        ), "Content was not deduplicated."
+        channel_save_bucket(1, upstream=True)
+        assert ryuitls.size(paths.RYUJINX_DATA_DIR, sizing="dir") == sizes[1]
+        channel_save_bucket(2, upstream=False)
+        assert save_bucket_size(2) == sizes[1], "Pulled content was lost."
+        USER_CONFIGS["saveStorage"] = "plain"
+        part = pathlib.Path(paths.SAVE_OBJECTS_DIR, "a.ryukit-part")
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.write_bytes(b"")
+        for id_ in sizes:
+            store_save_bucket(id_)
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            with store.lock():
+                collection = pool.submit(collect_save_garbage)
+                time.sleep(0.1)
+                assert (
+                    not collection.done()
+                ), "Garbage was collected under the store's lock."
+            assert collection.result() == 0 and not list(
+                pathlib.Path(paths.SAVE_OBJECTS_DIR).glob("*/*")
+            ), "Unreferenced objects were kept."
+        assert part.exists(), "An object being put was collected."
+        assert ryuitls.size(
+            pathlib.Path(paths.SAVE_INSTANCE_DIR).parent, sizing="dir"
+        ) == sum(
+            sizes[1] if id_ == 2 else size for id_, size in sizes.items()
+        ), "Content was lost when leaving storage."
+    finally:
+        USER_CONFIGS["saveStorage"] = "plain"
+
+
+@mark.parametrize(
+    "id_, crash, contended",
+    [
+        (1, None, False),
+        (2, 0, False),
+        (5, 1, False),
+        (1, 2, False),
+        (2, None, True),
+    ],
+)
+def test_stage_save_bucket(
+    seed: object, id_: int, crash: int | None, contended: bool
+):
+    USER_CONFIGS["saveApply"] = "staged"
+    try:
+        channel_save_bucket(2 if id_ == 1 else 1, upstream=True)
+        stage_save_bucket(id_)
+        if contended:
+            with sync.lock(f"{paths.SAVE_STAGING_FILE}.lock"):
+                channel_save_bucket(id_, upstream=True)
+            assert os.path.exists(
+                paths.SAVE_STAGING_FILE
+            ), "Staging was swapped in under another process's lock."
+        if crash is None:
+            assert (
+                channel_save_bucket(id_, upstream=True)["files"] == 0
+            ), "Staged content was transferred again."
+        else:
+            lives = list(INTERNAL_CONFIGS["save_buckets"]["flow"].values())
+            journal = {
+                live: os.path.exists(f"{live}.ryukit-staged") for live in lives
+            }
+            pathlib.Path(paths.SAVE_STAGING_FILE).write_text(
+                json.dumps({"swapping": journal})
+            )
+            for live in lives[:crash]:
+                if os.path.exists(live):
+                    os.replace(live, f"{live}.ryukit-retired")
+                if journal[live]:
+                    os.replace(f"{live}.ryukit-staged", live)
+            if crash < len(lives) and os.path.exists(lives[crash]):
+                os.replace(lives[crash], f"{lives[crash]}.ryukit-retired")
+            recover_staging()
+        assert sum(
+            ryuitls.size(live, sizing="dir")
+            for live in INTERNAL_CONFIGS["save_buckets"]["flow"].values()
+        ) == save_bucket_size(id_), "Staged content was not swapped in."
+        assert not os.path.exists(
+            paths.SAVE_STAGING_FILE
+        ), "Staging was left unsettled."
+    finally:
+        USER_CONFIGS["saveApply"] = "sync"
+
+
+@mark.parametrize("storage", ["plain", "dedup"])
+def test_record_save_bucket(
+    seed: object, monkeypatch: MonkeyPatch, storage: str
+):
+    USER_CONFIGS["saveStorage"] = storage
+    try:
+        store_save_bucket(1)
+        with bucket(1) as (client, _):
+            assert record_save_bucket(client, 1) == save_bucket_size(
+                1
+            ), "Records disagree with the bucket's size."
+        hashed: list[sync.PathLike] = []
+        digest = sync.digest
+
+        def counted(path: sync.PathLike):
+            hashed.append(path)
+            return digest(path)
+
+        monkeypatch.setattr(sync, "digest", counted)
+        with bucket(1) as (client, _):
+            record_save_bucket(client, 1)
+            assert not hashed, "Unchanged files were hashed again."
+            rows = list(
+                client.scalars(
+                    sqlalchemy.select(db.RyujinxSaveFile).where(
+                        db.RyujinxSaveFile.save_id == 1
+                    )
+                )
+            )
+            assert rows and all(
+                len(row.digest) == 64 for row in rows
+            ), "Files were not recorded."
+    finally:
+        USER_CONFIGS["saveStorage"] = "plain"
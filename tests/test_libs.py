@@ -0,0 +1,388 @@
+import concurrent.futures
+import ctypes
+import errno
+import filecmp
+import glob
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+import zipfile
+
+import sqlalchemy
+from pytest import MonkeyPatch, mark, raises
+
+from ryukit import utils
+from ryukit.libs import archive, configs, db, download, paths, sync, watch
+
+from .utils import serve
+
+__all__ = [
+    "test_sync",
+    "test_transfer",
+    "test_mirror_linked",
+    "test_watch",
+    "test_lock",
+    "test_cached",
+    "test_fetch_ranged",
+    "test_extract",
+    "test_engine",
+    "test_configs",
+]
+
+
+@mark.parametrize(
+    "source, dest, kept",
+    [
+        ({"a": b"1", "b/c": b"2"}, {}, set[str]()),
+        ({"a": b"1", "b/c": b"2"}, {"a": b"1", "b/c": b"3", "d": b""}, {"a"}),
+        ({"a": b"1"}, {"a/b": b"1", "c/d/e": b"2"}, set[str]()),
+        ({"a/b": b"1"}, {"a": b"1", "a.ryukit-part": b""}, set[str]()),
+        ({"a": b"12", "b": b"3"}, {"a": b"12", "b": b"4"}, {"a"}),
+        ({"a": b"", "b": b"1"}, {"a": b"1"}, set[str]()),
+    ],
+)
+def test_sync(
+    source: dict[str, bytes], dest: dict[str, bytes], kept: set[str]
+):
+    with tempfile.TemporaryDirectory() as dir:
+        for tree, files in [("source", source), ("dest", dest)]:
+            pathlib.Path(f"{dir}/{tree}").mkdir()
+            for name, content in files.items():
+                path = pathlib.Path(f"{dir}/{tree}/{name}")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content)
+                os.utime(path, ns=(0, 0) if tree == "dest" else (1, 1))
+        inodes = {name: os.stat(f"{dir}/dest/{name}").st_ino for name in kept}
+        report = sync.sync(f"{dir}/source", f"{dir}/dest")
+        assert report["files"] == len(source) - len(kept) and report[
+            "bytes"
+        ] == sum(
+            len(content)
+            for name, content in source.items()
+            if name not in kept
+        ), "Unexpected transfer tally."
+        assert {
+            name: os.stat(f"{dir}/dest/{name}").st_ino for name in kept
+        } == inodes, "Unchanged files were rewritten."
+        comparison = filecmp.dircmp(f"{dir}/source", f"{dir}/dest")
+        pending = [comparison]
+        while pending:
+            comparison = pending.pop()
+            assert (
+                []
+                == comparison.left_only
+                == comparison.right_only
+                == filecmp.cmpfiles(
+                    comparison.left,
+                    comparison.right,
+                    comparison.common_files,
+                    shallow=False,
+                )[1]
+            ), "Trees were not mirrored."
+            pending.extend(comparison.subdirs.values())
+
+
+@mark.parametrize(
+    "mode, writable, linked",
+    [
+        ("copy", False, False),
+        ("reflink", False, False),
+        ("link", True, False),
+        ("link", False, True),
+    ],
+)
+def test_transfer(mode: sync.Mode, writable: bool, linked: bool):
+    with tempfile.TemporaryDirectory() as dir:
+        source = pathlib.Path(f"{dir}/source")
+        source.write_bytes(os.urandom(pow(2, 16)))
+        source.chmod(0o644 if writable else 0o444)
+        sync.transfer(source, f"{dir}/dest", mode=mode)
+        assert filecmp.cmp(
+            source, f"{dir}/dest", shallow=False
+        ), "Content was not transferred."
+        assert (
+            os.path.samefile(source, f"{dir}/dest") == linked
+        ), "Unexpected linkage."
+
+
+def test_mirror_linked(monkeypatch: MonkeyPatch):
+    with tempfile.TemporaryDirectory() as dir:
+        source = pathlib.Path(f"{dir}/object")
+        source.write_bytes(b"1")
+        source.chmod(0o444)
+        os.utime(source, ns=(1, 1))
+        checksum = sync.digest(source)
+        trees = {
+            f"{dir}/{tree}": mtime_ns
+            for tree, mtime_ns in [("a", 1), ("b", 2)]
+        }
+
+        def mirror():
+            return [
+                sync.mirror(
+                    {
+                        "c": {
+                            "path": source,
+                            "size": 1,
+                            "mtime_ns": mtime_ns,
+                            "digest": checksum,
+                        }
+                    },
+                    [],
+                    tree,
+                    mode="link",
+                )["files"]
+                for tree, mtime_ns in trees.items()
+            ]
+
+        assert mirror() == [1, 1], "Content was not transferred."
+        hashed: list[sync.PathLike] = []
+        digest = sync.digest
+
+        def counted(path: sync.PathLike):
+            hashed.append(path)
+            return digest(path)
+
+        monkeypatch.setattr(sync, "digest", counted)
+        assert (
+            mirror() == [0, 0] and not hashed
+        ), "Placing one tree retimed the other's files."
+        assert [os.stat(f"{tree}/c").st_mtime_ns for tree in trees] == list(
+            trees.values()
+        ), "Files bear the wrong times."
+
+
+def test_lock():
+    with tempfile.TemporaryDirectory() as dir:
+
+        def attempt():
+            with sync.lock(f"{dir}/a/lock", block=False) as held:
+                return held
+
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            with sync.lock(f"{dir}/a/lock") as held:
+                assert (
+                    held and not pool.submit(attempt).result()
+                ), "The lock was taken twice."
+            assert pool.submit(attempt).result(), "The lock was kept."
+
+
+@mark.parametrize(
+    "events, exhausted", [(True, False), (False, False), (True, True)]
+)
+def test_watch(monkeypatch: MonkeyPatch, events: bool, exhausted: bool):
+    inotify = watch.inotify
+
+    def limited():
+        init, add_watch, rm_watch = inotify()
+
+        def add(fd: int, path: bytes, mask: int) -> int:
+            if b"/a/f" not in path:
+                return add_watch(fd, path, mask)
+            ctypes.set_errno(errno.ENOSPC)
+            return -1
+
+        return init, add, rm_watch
+
+    if exhausted:
+        monkeypatch.setattr(watch, "inotify", limited)
+    with tempfile.TemporaryDirectory() as dir:
+        roots = [f"{dir}/a", f"{dir}/b"]
+        pathlib.Path(f"{dir}/a/c").mkdir(parents=True)
+        pathlib.Path(f"{dir}/a/c/d").write_bytes(b"12")
+        steps = [
+            lambda: pathlib.Path(f"{dir}/a/e").write_bytes(b"123"),
+            lambda: pathlib.Path(f"{dir}/a/c/d").write_bytes(b"1"),
+            lambda: pathlib.Path(f"{dir}/a/c/d").write_bytes(b"2")
+            or os.utime(f"{dir}/a/c/d", ns=(pow(10, 9), pow(10, 9))),
+            lambda: pathlib.Path(f"{dir}/a/f/g").mkdir(parents=True)
+            or pathlib.Path(f"{dir}/a/f/g/h").write_bytes(b"1234"),
+            lambda: os.rename(f"{dir}/a/f", f"{dir}/f"),
+            lambda: os.rename(f"{dir}/f", f"{dir}/b"),
+            lambda: os.unlink(f"{dir}/a/e"),
+            lambda: shutil.rmtree(f"{dir}/a"),
+        ]
+        with watch.watch(roots, events=events) as poll:
+            assert poll() == {
+                "bytes": 2,
+                "churn": 0,
+            }, "Initial tally was miscounted."
+            churn = 0
+            for step in steps:
+                step()
+                tally = poll()
+                assert tally["bytes"] == sum(
+                    utils.size(root, sizing="dir") for root in roots
+                ), "Running total drifted from the trees."
+                assert tally["churn"] > churn, "Change went unnoticed."
+                churn = tally["churn"]
+            pathlib.Path(f"{dir}/b/i").mkdir()
+            os.rmdir(f"{dir}/b/i")
+            assert poll()["bytes"] == sum(
+                utils.size(root, sizing="dir") for root in roots
+            ), "Short-lived directory upset the tally."
+
+
+@mark.parametrize("ranges, held", [(True, 0), (True, 12345), (False, 12345)])
+def test_cached(seed: object, ranges: bool, held: int):
+    content = os.urandom(pow(2, 18))
+    sha256 = hashlib.sha256(content).hexdigest()
+    pathlib.Path(paths.DOWNLOAD_CACHE_DIR).mkdir(parents=True)
+    pathlib.Path(paths.DOWNLOAD_CACHE_DIR, "old").write_bytes(content)
+    os.utime(f"{paths.DOWNLOAD_CACHE_DIR}/old", ns=(0, 0))
+    pathlib.Path(paths.DOWNLOAD_CACHE_DIR, f"{sha256}.part").write_bytes(
+        content[:held]
+    )
+    pathlib.Path(paths.DOWNLOAD_CACHE_DIR, "other.part").write_bytes(content)
+    os.utime(f"{paths.DOWNLOAD_CACHE_DIR}/other.part", ns=(0, 0))
+    with serve({"/a": content}, ranges=ranges) as (url, log):
+        for _ in range(2):
+            path = download.cached(
+                f"{url}/a", sha256=sha256, capacity=len(content)
+            )
+            assert (
+                pathlib.Path(path).read_bytes() == content
+            ), "Downloaded content was corrupted."
+        assert log == [
+            ("/a", f"bytes={held}-" if held else None)
+        ], "Cached content was downloaded again."
+    assert not os.path.exists(
+        f"{paths.DOWNLOAD_CACHE_DIR}/old"
+    ), "Stale downloads were not evicted."
+    assert os.path.exists(
+        f"{paths.DOWNLOAD_CACHE_DIR}/other.part"
+    ), "A partial download was evicted."
+
+
+@mark.parametrize(
+    "ranges, connections, interrupted",
+    [(True, 4, False), (True, 1, False), (False, 4, False), (True, 4, True)],
+)
+def test_fetch_ranged(ranges: bool, connections: int, interrupted: bool):
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(done: int, total: int):
+        if done:
+            raise Interrupted
+
+    content = os.urandom(pow(2, 22) + 1)
+    with (
+        tempfile.TemporaryDirectory() as dir,
+        serve({"/a": content}, ranges=ranges) as (url, log),
+    ):
+        if interrupted:
+            with raises(Interrupted):
+                download.fetch_ranged(
+                    f"{url}/a", f"{dir}/a", connections=4, progress=interrupt
+                )
+            held = pathlib.Path(f"{dir}/a").read_bytes()
+            assert 0 < len(held) < len(content) and content.startswith(
+                held
+            ), "Interrupted download wasn't cut back to what was fetched."
+            assert download.fetch(
+                f"{url}/a", f"{dir}/a", resume=True
+            ) == hashlib.sha256(content).hexdigest() and log[-1] == (
+                "/a",
+                f"bytes={len(held)}-",
+            ), "Interrupted download wasn't resumed."
+            return
+        assert download.fetch_ranged(
+            f"{url}/a", f"{dir}/a", connections=connections
+        ) == hashlib.sha256(content).hexdigest() and (
+            pathlib.Path(f"{dir}/a").read_bytes() == content
+        ), "Downloaded content was corrupted."
+        assert len(log) == 1 + (
+            connections if ranges and connections > 1 else 1
+        ), "Content was not split across connections."
+
+
+def test_extract():
+    with tempfile.TemporaryDirectory() as dir:
+        content = {"a/b": os.urandom(pow(2, 16)), "a/c/d": b"1", "e/f": b"2"}
+        with zipfile.ZipFile(f"{dir}/archive.zip", "w") as zip:
+            zip.writestr("metadata.json", "{}")
+            zip.writestr("../g", b"3")
+            for name, data in content.items():
+                zip.writestr(name, data)
+        routes = {"a": f"{dir}/x", "e": f"{dir}/y/z"}
+        report = archive.extract(f"{dir}/archive.zip", routes)
+        assert report["files"] == 3, "Members were skipped."
+        pathlib.Path(f"{dir}/x/b").write_bytes(b"0")
+        inode = os.stat(f"{dir}/x/c/d").st_ino
+        with concurrent.futures.ThreadPoolExecutor(2) as pool:
+            report = archive.extract(f"{dir}/archive.zip", routes, pool=pool)
+        assert report == {
+            "files": 1,
+            "bytes": pow(2, 16),
+        }, "Matching files were rewritten."
+        assert os.stat(f"{dir}/x/c/d").st_ino == inode
+        for name, data in content.items():
+            prefix, _, rest = name.partition("/")
+            assert (
+                pathlib.Path(routes[prefix], rest).read_bytes() == data
+            ), "Members were not extracted."
+        assert not os.path.exists(f"{dir}/g"), "A member escaped its route."
+
+
+def test_engine(seed: object):
+    assert db.engine() is db.engine(), "Engine wasn't reused."
+    with (
+        db.transaction() as transaction,
+        concurrent.futures.ThreadPoolExecutor(1) as pool,
+    ):
+
+        def joined():
+            with db.client() as client:
+                return client.connection() is transaction
+
+        assert (
+            joined() and not pool.submit(joined).result()
+        ), "The transaction was joined outside its thread."
+    with db.client() as client:
+        connection = client.connection()
+        assert connection.exec_driver_sql(
+            "PRAGMA user_version"
+        ).scalar_one() == len(db.MIGRATIONS) and set(
+            db.Base.metadata.tables
+        ) <= set(
+            sqlalchemy.inspect(connection).get_table_names()
+        ), "Database wasn't migrated."
+        assert (
+            connection.exec_driver_sql("PRAGMA journal_mode").scalar_one()
+            == "wal"
+        ), "Database isn't in WAL mode."
+    pathlib.Path(paths.DATABASE_FILE).unlink()
+    with db.client() as client:
+        assert (
+            client.scalar(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                    db.RyujinxSave
+                )
+            )
+            == 0
+        ), "Database wasn't recreated."
+
+
+def test_configs(seed: object):
+    schema = '{"properties": {"a": {"type": "integer"}}}'
+    assert configs.validate({"a": 1}, schema), "Check was skipped."
+    assert not configs.validate(
+        {"a": 1}, schema
+    ), "Unchanged configuration was checked again."
+    with raises(ValueError):
+        configs.validate({"a": "1"}, schema)
+    assert configs.validate({"a": 2}, schema), "Check was skipped."
+    assert configs.persist(paths.CONFIG_FILE, "{}"), "File wasn't written."
+    inode = os.stat(paths.CONFIG_FILE).st_ino
+    assert not configs.persist(
+        paths.CONFIG_FILE, "{}"
+    ), "Unchanged file was written."
+    assert configs.persist(paths.CONFIG_FILE, "[]") and (
+        pathlib.Path(paths.CONFIG_FILE).read_text() == "[]"
+    ), "Changed file wasn't written."
+    assert os.stat(paths.CONFIG_FILE).st_ino != inode and not glob.glob(
+        f"{paths.CONFIG_FILE}.*"
+    ), "File wasn't replaced through a rename."
@@ -57,6 +57,18 @@ def test_size(obj: object, sizing: str, expected: int) -> None:
     ), "Incorrect size calculation."
 
 
+def test_size_cache():
+    with tempfile.TemporaryDirectory() as dir:
+        pathlib.Path(f"{dir}/a/b").mkdir(parents=True)
+        pathlib.Path(f"{dir}/a/b/c").write_bytes(b"1")
+        assert utils.size(dir, sizing="dir") == 1
+        pathlib.Path(f"{dir}/a/b/c").write_bytes(b"12")
+        pathlib.Path(f"{dir}/a/d").write_bytes(b"3")
+        assert utils.size(dir, sizing="dir") == 3, "Stale size returned."
+        shutil.rmtree(f"{dir}/a/b")
+        assert utils.size(dir, sizing="dir") == 1, "Stale size returned."
+
+
 @mark.parametrize(
     "save_args",
     [
@@ -67,6 +79,7 @@ def test_size(obj: object, sizing: str, expected: int) -> None:
             "updated": datetime.datetime(2025, 5, 24, 13, 12, 36),
             "last_used": None,
             "size": 0,
+            "scope": None,
         },
         {
             "id": 1648,
@@ -75,6 +88,7 @@ def test_size(obj: object, sizing: str, expected: int) -> None:
             "updated": datetime.datetime(2025, 5, 24, 13, 12, 36),
             "last_used": None,
             "size": 67880,
+            "scope": ["0000000000000001"],
         },
     ],
 )
@@ -1,10 +1,17 @@
 """Common utilities."""
 
+import contextlib
 import functools
+import http.server
 import os
+import re
+import threading
+import time
 from typing import Callable
 
-__all__ = ["requires_vars"]
+import psutil
+
+__all__ = ["requires_vars", "serve", "await_process"]
 
 
 def requires_vars(*vars: str):
@@ -26,3 +33,71 @@ def requires_vars(*vars: str):
         return core
 
     return inner
+
+
+@contextlib.contextmanager
+def serve(resources: dict[str, bytes], /, *, ranges: bool = True):
+    """
+    Serve resources over HTTP from a local port.
+
+    :param resources: Resource content, keyed by path.
+    :param ranges: Set as false to ignore range requests.
+    :returns: The server's base URL, alongside a log of requested paths and ranges.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            log.append((self.path, self.headers.get("Range")))
+            if self.path not in resources:
+                return self.send_error(404)
+            content = resources[self.path]
+            match = re.fullmatch(
+                r"bytes=(\d+)-(\d*)", self.headers.get("Range") or ""
+            )
+            if ranges and match:
+                start = int(match[1])
+                end = int(match[2]) + 1 if match[2] else len(content)
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{end - 1}/{len(content)}"
+                )
+                content = content[start:end]
+            else:
+                self.send_response(200)
+            if ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format: str, *args: object):
+            pass
+
+    log: list[tuple[str, str | None]] = []
+    with http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}", log
+        finally:
+            server.shutdown()
+
+
+def await_process(name: str, /, *, timeout: float = 5):
+    """
+    Wait for a process to appear under a name.
+
+    :param name: The process's name.
+    :param timeout: Seconds to wait before giving up.
+    :raises TimeoutError: If the process doesn't appear in time.
+    """
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if any(
+            process.info["name"] == name
+            for process in psutil.process_iter(["name"])
+        ):
+            return
+        time.sleep(0.01)
+    raise TimeoutError(f"No process named '{name}' appeared.")